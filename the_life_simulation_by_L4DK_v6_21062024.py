@@ -30,15 +30,45 @@
 
 # Import libraries
 import pygame  # for graphics
+from pygame import gfxdraw  # for the pre-rendered atom sprites
+import numpy as np  # for vectorized physics
 import random  # for random number generation
 import math  # for math functions
-import pickle  # for saving and loading
 import time  # for timing
+from operator import attrgetter  # for reading atom attributes into arrays
+from pathlib import Path  # for the save files
+
+# Numba is optional, without it the physics kernels run as plain NumPy
+try:
+    from numba import config, njit, prange  # for compiling the physics kernels
+
+    HAVE_NUMBA = True
+    NUM_THREADS = config.NUMBA_NUM_THREADS  # Number of per-thread force buffers
+except ImportError:
+    HAVE_NUMBA = False
+
+    # Leave the kernels uncompiled, the NumPy versions below replace them
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+    prange = range
+    NUM_THREADS = 1
+
+# A CUDA GPU is optional as well, it takes over the forces of large worlds
+try:
+    from numba import cuda  # for the GPU force kernel
+
+    HAVE_CUDA = cuda.is_available()
+except ImportError:
+    HAVE_CUDA = False
 
 # Sets the MOST IMPORTANT rule in this simulation, which must be set to 42.
 # The Answer to the Ultimate Question of Life, The Universe, and Everything
 random.seed(42)
 
+# Random number generator for the per-frame noise, drawn in batches for all atoms
+RNG = np.random.default_rng(42)
+
 # Initialize Pygame
 # Url: https://www.pygame.org/docs/index.html
 pygame.init()  # initialize pygame
@@ -56,6 +86,18 @@ ATOM_COLORS = [RED, YELLOW, BLUE, GREEN, WHITE, BLACK, PURPLE]
 FOOD_COLORS = [GREEN, WHITE, BLACK, PURPLE]
 # Constants for the colors
 FOOD_COLOR = GREEN  # Color of food
+INTENSITY_BUCKETS = 16  # Number of energy intensity levels the atoms are drawn with
+SPRITE_MAX_RADIUS = 16  # Larger atoms are drawn directly instead of from cached sprites
+# Color intensity of each energy bucket, from 0 to 255
+INTENSITY_LEVELS = [
+    bucket * 255 // (INTENSITY_BUCKETS - 1) for bucket in range(INTENSITY_BUCKETS)
+]
+# Atom colors, indexed by the energy bucket plus INTENSITY_BUCKETS for positive charges
+ATOM_PALETTE = [
+    (intensity, intensity, 255) if positive else (255, intensity, intensity)
+    for positive in (False, True)
+    for intensity in INTENSITY_LEVELS
+]
 
 # Constants for the simulation
 WINDOW_SIZE = 1200  # Size of the window
@@ -64,6 +106,7 @@ ATOM_SIZE = 5.0  # Size of the atoms
 SPEED = 2.0  # Adjust initial speed if necessary
 TRAIL_LENGTH = 10.0  # Length of motion trails
 MAX_VELOCITY = 5.0  # Maximum velocity for atoms
+WANDER_STRENGTH = 0.1  # Maximum random velocity change of a wandering atom per frame
 DAMPING_FACTOR = 0.995  # Damping factor to reduce energy over time
 COLLISION_DAMPING = 0.98  # Damping applied during collisions
 FORCE_SCALE = 1.0  # Increased scale factor for visualizing forces
@@ -78,7 +121,11 @@ MATING_SEASON = True  # Enable mating season
 
 # Constants for the time control
 TIME_STEP = 0.1  # Time step for the simulation
-SIMULATION_SPEED = 1.0  # Speed multiplier for the simulation
+SIMULATION_SPEED = 1.0  # Physics steps per frame, 0 pauses and fractions skip frames
+CAPTION_INTERVAL = 250  # Milliseconds between window caption updates
+
+# Constants for saving and loading
+SAVE_DIR = Path("saves")  # Directory the simulations are saved in and loaded from
 
 # Constants for the evolution
 EVOLUTION_RATE = 0.01  # Rate of evolution
@@ -87,9 +134,11 @@ EVOLUTION_RATE = 0.01  # Rate of evolution
 FOOD_RATE = 0.01  # Food generation rate
 FOOD_SPAWN_PROBABILITY = 0.01  # Probability of food spawning
 
-# Constants for the species
-ATOM_SPECIES = "atom"
-FOOD_SPECIES = "food"
+# Constants for the species, stored as ints so comparisons are plain int compares
+RED_SPECIES = 0
+BLUE_SPECIES = 1
+FOOD_SPECIES = 2
+SPECIES_NAMES = ("red", "blue", "food")  # Display name of each species
 
 # Constants for the battle
 BATTLE_RADIUS = 10.0  # Radius of battle
@@ -105,9 +154,45 @@ REPRODUCTION_COOLDOWN = 60.0
 NUM_FOOD_ATOMS = 50  # Number of food atoms
 FOOD_SIZE = 3.0  # Size of food atoms
 
+# Constants for the spatial hash grid
+GRID_CELL_SIZE = 2 * FORCE_THRESHOLD  # Size of a grid cell
+
+# Constants for the force neighbour list
+NEIGHBOR_SKIN = 30.0  # Extra margin around FORCE_THRESHOLD before the list is rebuilt
+MIN_R2 = 1e-6  # Smallest squared distance of a pair, keeps 1 / r^3 finite in float32
+
+# Constants for the Barnes-Hut quadtree
+BARNES_HUT_MIN_CELL_ATOMS = 1000  # Minimum atoms in one FORCE_THRESHOLD-sized cell for the quadtree
+BARNES_HUT_THETA = 0.5  # Opening criterion, a cell is one pseudo-atom when size / distance < theta
+QUADTREE_MAX_DEPTH = 32  # Atoms this close together share a leaf
+
+# Constants for the GPU force kernel
+CUDA_MIN_ATOMS = 5000  # Minimum number of atoms for the GPU, below it the copies cost more
+CUDA_TILE = 128  # Atoms staged in shared memory at once, also the threads per block
+
 
 # Define the Atom class
 class Atom:
+    # Fixed attribute layout without a per-instance __dict__
+    __slots__ = (
+        "x",
+        "y",
+        "vx",
+        "vy",
+        "mass",
+        "charge",
+        "size",
+        "color",
+        "species",
+        "hunger",
+        "health",
+        "age",
+        "in_battle",
+        "reproduction_cooldown",
+        "alive",
+        "index",
+    )
+
     # Define the Atom constructor
     def __init__(
         self,
@@ -119,7 +204,7 @@ class Atom:
         charge: float,
         size: float,
         color: tuple[int, int, int],
-        species: str,
+        species: int,
     ) -> None:
         """
         Initializes a new instance of the Atom class.
@@ -133,7 +218,7 @@ class Atom:
             charge (float): The charge of the atom.
             size (float): The size of the atom.
             color (tuple[int, int, int]): The color of the atom as a tuple of RGB values.
-            species (str): The species of the atom.
+            species (int): The species of the atom, one of the *_SPECIES constants.
 
         Returns:
             None
@@ -147,16 +232,14 @@ class Atom:
             - charge (float): The charge of the atom.
             - size (float): The size of the atom.
             - color (tuple[int, int, int]): The color of the atom as a tuple of RGB values.
-            - species (str): The species of the atom.
-            - energy (int): The energy of the atom.
+            - species (int): The species of the atom, one of the *_SPECIES constants.
             - hunger (int): The hunger level of the atom.
             - health (int): The health level of the atom.
             - age (int): The age of the atom.
-            - trail (list[tuple[float, float]]): The trail of the atom as a list of (x, y) coordinates.
-            - fx (float): The x-component of the net force acting on the atom.
-            - fy (float): The y-component of the net force acting on the atom.
             - in_battle (bool): Indicates whether the atom is in a battle.
             - reproduction_cooldown (float): The cooldown period for reproduction.
+            - alive (bool): False once the atom has died or been eaten and is waiting to be removed.
+            - index (int): The row of the atom in the World arrays, -1 while not in a World.
         """
 
         # Initialize the instance variables
@@ -169,24 +252,35 @@ class Atom:
         self.size = size
         self.color = color
         self.species = species
-        self.energy = 100
         self.hunger = 100
         self.health = 100
         self.age = 0
-        self.trail: list[tuple[float, float]] = []
-        self.fx = 0.0
-        self.fy = 0.0
         self.in_battle: bool = False
         self.reproduction_cooldown: float = 0.0
+        self.alive: bool = True
+        self.index: int = -1
+
+    # ENERGY
+    # https://en.wikipedia.org/wiki/Kinetic_energy
+    @property
+    def energy(self) -> float:
+        """
+        The kinetic energy of the atom, computed on demand.
+
+        Returns:
+            float: 0.5 * mass * velocity^2
+        """
+        return 0.5 * self.mass * (self.vx * self.vx + self.vy * self.vy)
 
     # REPRODUCTION
     # Reproduce the atom
-    def reproduce(self, atoms):
+    def reproduce(self, world, grid):
         """
         Reproduce the atom by finding a mate and mating with it.
 
         Args:
-            atoms (list): A list of Atom objects representing the population.
+            world (World): The world holding the population.
+            grid (dict): The spatial hash grid of the atoms.
 
         Returns:
             None
@@ -201,143 +295,44 @@ class Atom:
             - The mate_with method should be defined in the Atom class and should take an Atom object representing the mate as a parameter.
         """
         if self.reproduction_cooldown == 0:
-            mate = self.find_mate(atoms)
+            mate = self.find_mate(grid)
             if mate:
-                self.mate_with(mate, atoms)
+                self.mate_with(mate, world)
                 self.reproduction_cooldown = REPRODUCTION_COOLDOWN
                 mate.reproduction_cooldown = REPRODUCTION_COOLDOWN
 
     # EAT
     # Eat nearby food atoms
-    def eat(self, atoms):
+    def eat(self, grid):
         """
-        Eat nearby food atoms to regain hunger and energy.
+        Eat nearby food atoms to regain hunger.
 
         Args:
-            atoms (list): A list of Atom objects representing the population.
+            grid (dict): The spatial hash grid of the atoms.
 
         Returns:
-            None
+            Atom or None: The eaten food atom, or None if no food atom was eaten.
 
-        This function iterates over the atoms list and checks if the current atom is a food atom
+        This function iterates over the grid cells around the atom and checks if an atom is a food atom
         and if there is a collision with the current atom.
-        If both conditions are met, the atom's hunger and energy are increased by 20
-        and the food atom is removed from the atoms list.
+        If both conditions are met, the atom's hunger is increased by 20
+        and the food atom is marked as no longer alive.
+        The caller removes dead atoms in one batch with World.remove_dead_atoms.
 
         The function exits the loop after finding the first food atom.
         """
-        for atom in atoms:
-            # Check if the current atom is a food atom and if there is a collision
-            if atom.species == "food" and self.check_collision(atom):
-                # Increase hunger and energy by 20 and remove the food atom from the list
+        for atom in nearby_atoms(grid, self.x, self.y):
+            # Check if the current atom is uneaten food and if there is a collision
+            if (
+                atom.species == FOOD_SPECIES
+                and atom.alive
+                and self.check_collision(atom)
+            ):
+                # Increase hunger by 20 and mark the food atom as eaten
                 self.hunger = min(100, self.hunger + 20)
-                self.energy = min(100, self.energy + 20)
-                atoms.remove(atom)
-                break
-
-    # CHECK BOUNDS
-    # Check if the atom is in bounds
-    def check_bounds(self):
-        """
-        Ensure the atom stays within the window bounds.
-
-        This function checks if the atom's position is outside the window bounds.
-        If it is, it adjusts the atom's velocity to bounce it back into the window.
-
-        Note:
-            - The window bounds are defined by the WINDOW_SIZE constant.
-        """
-        # Check if the atom's x position is outside the window bounds
-        if self.x < 0 or self.x > WINDOW_SIZE:
-            # Adjust the x velocity to bounce the atom back into the window
-            self.vx *= -1
-
-        # Check if the atom's y position is outside the window bounds
-        if self.y < 0 or self.y > WINDOW_SIZE:
-            # Adjust the y velocity to bounce the atom back into the window
-            self.vy *= -1
-
-        # Ensure the atom's position stays within the window bounds
-        self.x = max(0, min(self.x, WINDOW_SIZE))
-        self.y = max(0, min(self.y, WINDOW_SIZE))
-
-    # UPDATE POSITION
-    # Update the position of the atom
-    def update_position(self) -> None:
-        """
-        Update the position of the atom.
-
-        This function updates the position of the atom based on its velocity.
-        It also applies damping to the velocities, ensures the atom stays within the window bounds,
-        limits the velocity, updates the energy based on kinetic energy, and updates the trail.
-
-        Returns:
-            None
-        """
-        # Update the position based on the velocity
-        self.x += self.vx * SIMULATION_SPEED
-        self.y += self.vy * SIMULATION_SPEED
-
-        # Apply damping to velocities
-        self.vx *= DAMPING_FACTOR
-        self.vy *= DAMPING_FACTOR
-
-        # Ensure the atom stays within the window bounds
-        self.check_bounds()
-
-        # Limit the velocity
-        self.vx = max(-MAX_VELOCITY, min(self.vx, MAX_VELOCITY))
-        self.vy = max(-MAX_VELOCITY, min(self.vy, MAX_VELOCITY))
-
-        # Update energy based on kinetic energy
-        self.energy = 0.5 * self.mass * (self.vx**2 + self.vy**2)
-
-        # Update trail
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > TRAIL_LENGTH:
-            self.trail.pop(0)
-
-    # APPLY FORCE
-    # Apply a force to the atom
-    def apply_force(self, fx: float, fy: float) -> None:
-        """
-        Apply a force to the atom.
-
-        Args:
-            fx (float): The x-component of the force.
-            fy (float): The y-component of the force.
-
-        Updates the force components and the velocity of the atom based on the given force.
-
-        The velocity is updated by adding the force divided by the mass of the atom.
-
-        Returns:
-            None
-        """
-        # Update the force components
-        self.fx += fx
-        self.fy += fy
-
-        # Update the velocity based on the force
-        self.vx += fx / self.mass
-        self.vy += fy / self.mass
-
-    # RESET FORCE
-    # Reset the force components of the atom
-    def reset_force(self) -> None:
-        """
-        Reset the force components of the atom.
-
-        This function sets the x and y components of the force to zero.
-
-        Returns:
-            None
-        """
-        # Reset the x-component of the force
-        self.fx = 0.0
-
-        # Reset the y-component of the force
-        self.fy = 0.0
+                atom.alive = False
+                return atom
+        return None
 
     # CHECK COLLISION
     # Check if the atom is colliding with another atom
@@ -351,11 +346,13 @@ class Atom:
         Returns:
             bool: True if the atoms are colliding, False otherwise.
         """
-        # Calculate the distance between the atoms
-        distance = math.hypot(self.x - other.x, self.y - other.y)
+        # Calculate the squared distance between the atoms
+        dx = self.x - other.x
+        dy = self.y - other.y
+        radii = self.size + other.size
 
         # Check if the distance is less than the sum of the radii of the atoms
-        return distance < self.size + other.size
+        return dx * dx + dy * dy < radii * radii
 
     # RESOLVE COLLISION
     # Resolve a collision between two atoms
@@ -373,13 +370,14 @@ class Atom:
         nx = other.x - self.x  # Calculate the x-component of the normal vector
         ny = other.y - self.y  # Calculate the y-component of the normal vector
 
-        distance = math.hypot(nx, ny)  # Calculate the distance between the atoms
+        r2 = nx * nx + ny * ny  # Calculate the squared distance between the atoms
 
-        if distance == 0:  # If the distance is zero, no collision
+        if r2 == 0:  # If the distance is zero, no collision
             return
 
-        nx /= distance  # Normalize the normal vector
-        ny /= distance  # Normalize the normal vector
+        inv_r = 1.0 / math.sqrt(r2)  # One square root and division for both components
+        nx *= inv_r  # Normalize the normal vector
+        ny *= inv_r  # Normalize the normal vector
 
         # Calculate relative velocity
         dvx = self.vx - other.vx  # Calculate the x-component of the relative velocity
@@ -394,88 +392,63 @@ class Atom:
         if vn > 0:
             return
 
-        # Calculate impulse scalar
-        impulse = (2 * vn) / (self.mass + other.mass)  # Calculate the impulse scalar
+        # Calculate impulse scalar, with the collision damping folded in once
+        impulse = (
+            (2 * vn) / (self.mass + other.mass) * COLLISION_DAMPING
+        )  # Calculate the impulse scalar
 
-        # Apply impulse to the atoms and apply collision damping
-        self.vx -= (
-            impulse * other.mass * nx * COLLISION_DAMPING
-        )  # Apply impulse to self
-        self.vy -= (
-            impulse * other.mass * ny * COLLISION_DAMPING
-        )  # Apply impulse to self
+        # Apply the damped impulse to the atoms
+        self.vx -= impulse * other.mass * nx  # Apply impulse to self
+        self.vy -= impulse * other.mass * ny  # Apply impulse to self
 
-        other.vx += (
-            impulse * self.mass * nx * COLLISION_DAMPING
-        )  # Apply impulse to other
-        other.vy += (
-            impulse * self.mass * ny * COLLISION_DAMPING
-        )  # Apply impulse to other
+        other.vx += impulse * self.mass * nx  # Apply impulse to other
+        other.vy += impulse * self.mass * ny  # Apply impulse to other
 
     # FLEE
     # Flee from nearby atoms
-    def flee(self, atoms):
+    def flee(self, grid, noise_x, noise_y):
         """
         Flee from nearby atoms. If the atom is healthy (health < 30), flee in random directions.
 
         Parameters:
             self: The current atom.
-            atoms: List of atoms to flee from.
+            grid (dict): The spatial hash grid of the atoms to flee from.
+            noise_x (float): A uniform random value between -1 and 1 from the per-frame noise.
+            noise_y (float): A uniform random value between -1 and 1 from the per-frame noise.
 
         Returns:
             None
         """
         # Flee from nearby atoms
-        for atom in atoms:
+        for atom in nearby_atoms(grid, self.x, self.y):
             if self.check_collision(atom):
                 self.resolve_collision(atom)
         # If the atom is healthy
         if self.health < 30:
             # Flee in random directions
-            self.vx += random.uniform(-1, 1)
-            self.vy += random.uniform(-1, 1)
-
-    # FIND NEAREST FOOD
-    # Find the closest food atom
-    def find_nearest_food(self, atoms):
-        """
-        Finds the nearest food atom in the given list of atoms.
-
-        Parameters:
-            self (object): The current instance of the class.
-            atoms (list): A list of atoms.
-
-        Returns:
-            Atom or None: The nearest food atom, or None if no food atom is found.
-        """
-        closest_food = None
-        closest_distance = float("inf")
-        for atom in atoms:
-            if atom.species == "food":
-                distance = math.hypot(self.x - atom.x, self.y - atom.y)
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_food = atom
-        return closest_food
+            self.vx += noise_x
+            self.vy += noise_y
 
     # FIND MATE
     # Find a suitable mate
-    def find_mate(self, atoms):
+    def find_mate(self, grid):
         """
-        Finds a suitable mate for the current atom from the given list of atoms.
+        Finds a suitable mate for the current atom in the grid cells around the atom.
 
         Parameters:
             self (Atom): The current atom.
-            atoms (list): A list of atoms.
+            grid (dict): The spatial hash grid of the atoms.
 
         Returns:
             Atom or None: The suitable mate atom, or None if no suitable mate is found.
         """
         # Find a suitable mate
-        for other in atoms:
+        for other in nearby_atoms(grid, self.x, self.y):
             # Check if the other atom is not the current atom
             if (
                 other != self  # Check if the other atom is not the current atom
+                # Check if the other atom has not died or been eaten
+                and other.alive
                 # Check if the other atom is healthy
                 and other.health > 70
                 # Check if the other atom can reproduce
@@ -486,31 +459,6 @@ class Atom:
                 return other  # Return the suitable mate
         return None
 
-        # FIND MATE
-        def find_mate(self, atoms):
-            """
-            Finds a suitable mate for the current atom from the given list of atoms.
-
-            Parameters:
-                atoms (list): A list of atoms.
-
-            Returns:
-                Atom or None: The suitable mate atom, or None if no suitable mate is found.
-            """
-            mate = None
-            # Find a suitable mate for the current atom
-            for atom in atoms:
-                # Check if the other atom is not the current atom
-                if atom is not self and atom.species == self.species:
-                    # Check the distance to mate atom and mate if it is less than 100
-                    distance = math.hypot(atom.x - self.x, atom.y - self.y)
-                    # Check if the distance is less than 100
-                    if distance < 100:
-                        # Set the mate to the other atom
-                        mate = atom
-                        break
-            return mate
-
     # CHASE
     # Chase a target
     def chase(self, target):
@@ -523,96 +471,125 @@ class Atom:
         Returns:
             None
         """
-        # Calculate the distance between the atoms
+        # Calculate the squared distance between the atoms
         dx = target.x - self.x
         dy = target.y - self.y
-        distance = math.hypot(dx, dy)
+        r2 = dx * dx + dy * dy
         # Check if the distance
-        if distance > 0:
-            self.vx += dx / distance * 0.1
-            self.vy += dy / distance * 0.1
+        if r2 > 0:
+            # Scale the unit direction by 0.1 with a single division
+            inv = 0.1 / math.sqrt(r2)
+            self.vx += dx * inv
+            self.vy += dy * inv
 
     # WANDER
     # Wander around
-    def wander(self):
+    def wander(self, noise_x, noise_y):
         """
-        Update the velocity of the current atom by adding a random value
-        between -0.1 and 0.1 to the x and y components of the velocity.
+        Update the velocity of the current atom by adding a random value between
+        -WANDER_STRENGTH and WANDER_STRENGTH to the x and y components of the velocity.
 
-        This function randomly generates a value between -0.1 and 0.1
-        and adds it to the x and y components of the velocity of the current atom.
+        This function scales the given random values to between -WANDER_STRENGTH
+        and WANDER_STRENGTH and adds them to the x and y components of the velocity of the current atom.
         This creates a wander behavior where the atom moves in a random direction.
 
         Parameters:
-            None
+            noise_x (float): A uniform random value between -1 and 1 from the per-frame noise.
+            noise_y (float): A uniform random value between -1 and 1 from the per-frame noise.
 
         Returns:
             None
         """
-        self.vx += random.uniform(-0.1, 0.1)
-        self.vy += random.uniform(-0.1, 0.1)
-
-    # FIND NEAREST ATOM
-    # Find the closest atom
-    def find_nearest_atom(self, atoms):
-        """
-        Finds the nearest atom in the given list of atoms.
-
-        Parameters:
-            self (object): The current instance of the class.
-            atoms (list): A list of atoms.
-
-        Returns:
-            Atom or None: The nearest atom, or None if no atom is found.
-        """
-        closest_atom = None
-        closest_distance = float("inf")
-        for other in atoms:
-            if other != self:
-                distance = math.hypot(self.x - other.x, self.y - other.y)
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_atom = other
-        return closest_atom
+        self.vx += WANDER_STRENGTH * noise_x
+        self.vy += WANDER_STRENGTH * noise_y
 
     # MATE WITH
     # Combine genetic traits to produce offspring
-    def mate_with(self, mate, atoms):
+    def mate_with(self, mate, world):
         """
         Combines the genetic traits of two atoms to produce offspring.
 
         Parameters:
             self (Atom): The first atom.
             mate (Atom): The second atom.
-            atoms (list): A list of atoms.
+            world (World): The world the offspring is added to.
 
         Returns:
             None
 
         This function combines the genetic traits of the two atoms to produce offspring.
         It calls the `combine_atoms` function to generate the new atom.
-        If the new atom is successfully created, it is appended to the `atoms` list.
+        If the new atom is successfully created, it is added to the `world`.
         The reproduction cooldown is set to 60 for both the current atom and the mate.
 
         Note:
             - The `combine_atoms` function should be defined elsewhere.
-            - The `atoms` list should be mutable.
         """
         # Combine genetic traits to produce offspring
         new_atom = combine_atoms(self, mate)
         if new_atom:
-            atoms.append(new_atom)
+            world.add_atom(new_atom)
         self.reproduction_cooldown = 60  # Cooldown after reproduction
         mate.reproduction_cooldown = 60
 
+    # SCAN NEIGHBORS
+    # Find the nearest atom, food atom and mate in one pass
+    def scan_neighbors(self, grid):
+        """
+        Finds the nearest atom, the nearest food atom and the nearest suitable mate
+        in a single pass over the grid cells around the atom.
+
+        Parameters:
+            grid (dict): The spatial hash grid of the atoms.
+
+        Returns:
+            tuple: The nearest atom, the squared distance to it, the nearest food atom,
+            and the nearest suitable mate. Atoms that are not found are None
+            and the squared distance is then infinite.
+
+        The mate conditions match find_mate.
+        """
+        x = self.x
+        y = self.y
+        species = self.species
+        closest_atom = closest_food = closest_mate = None
+        atom_r2 = food_r2 = mate_r2 = float("inf")
+        for other in nearby_atoms(grid, x, y):
+            # Atoms that died or were eaten this frame are ignored
+            if other is self or not other.alive:
+                continue
+            # Compare squared distances, no square root is needed
+            dx = x - other.x
+            dy = y - other.y
+            r2 = dx * dx + dy * dy
+            # Nearest atom of any kind
+            if r2 < atom_r2:
+                atom_r2 = r2
+                closest_atom = other
+            # Nearest food atom
+            if other.species == FOOD_SPECIES and r2 < food_r2:
+                food_r2 = r2
+                closest_food = other
+            # Nearest healthy atom of the same species that can reproduce
+            if (
+                other.species == species
+                and other.health > 70
+                and other.reproduction_cooldown == 0
+                and r2 < mate_r2
+            ):
+                mate_r2 = r2
+                closest_mate = other
+        return closest_atom, atom_r2, closest_food, closest_mate
+
     # DECIDE BEHAVIOR
     # Define the behavior of the atom
-    def decide_behavior(self, atoms):
+    def decide_behavior(self, grid, noise):
         """
         Decide the behavior of the atom based on its current state and the state of the environment.
 
         Args:
-            atoms (list): A list of all the atoms in the environment.
+            grid (dict): The spatial hash grid of all the atoms in the environment.
+            noise (list[float]): 4 uniform random values between -1 and 1 from the per-frame noise.
 
         Returns:
             None
@@ -626,10 +603,13 @@ class Atom:
         If none of the above conditions are met, it will wander or chase the nearest atom.
 
         Note:
-            - The `flee`, `chase`, `find_nearest_food`, `find_mate`, `find_nearest_atom`, and `wander` methods
-            should be defined elsewhere.
-            - The `atoms` list should be mutable.
+            - The `flee`, `chase`, `scan_neighbors`, and `wander` methods should be defined elsewhere.
+            - Only atoms in the grid cells around the atom are considered.
+            - The nearest atom, food and mate are found in a single scan.
         """
+        # Find the nearest atom, food and mate in one pass
+        closest_atom, closest_r2, food, mate = self.scan_neighbors(grid)
+
         # Reproduction cooldown
         if self.reproduction_cooldown > 0:
             self.reproduction_cooldown -= 1
@@ -637,35 +617,23 @@ class Atom:
         # If the atom is healthy
         if self.health < 30:
             # Flee from nearby atoms
-            self.flee(atoms)
+            self.flee(grid, noise[0], noise[1])
         else:
             # Random movement
-            self.vx += random.uniform(-0.1, 0.1)
-            self.vy += random.uniform(-0.1, 0.1)
+            self.wander(noise[0], noise[1])
 
         # Behavior: move towards other atoms if not in battle
         if not self.in_battle:
-            closest_atom = None
-            closest_distance = float("inf")
-            for other in atoms:
-                if other != self:
-                    distance = math.hypot(self.x - other.x, self.y - other.y)
-                    if distance < closest_distance:
-                        closest_distance = distance
-                        closest_atom = other
             if closest_atom:
-                dx = closest_atom.x - self.x
-                dy = closest_atom.y - self.y
-                distance = math.hypot(dx, dy)
-                if distance > 0:
-                    self.vx += dx / distance * 0.1
-                    self.vy += dy / distance * 0.1
+                # The scan already holds the squared distance to the closest atom
+                if closest_r2 > 0:
+                    inv = 0.1 / math.sqrt(closest_r2)
+                    self.vx += (closest_atom.x - self.x) * inv
+                    self.vy += (closest_atom.y - self.y) * inv
 
         # If the atom is hungry, find food
         if self.hunger < 50:
-            # Find nearest food
-            food = self.find_nearest_food(atoms)
-            # If food is found, chase it
+            # If the nearest food is found, chase it
             if food:
                 self.chase(food)
         elif (
@@ -677,26 +645,25 @@ class Atom:
             and self.hunger > 50
             and self.health > 50
         ):
-            # Find nearest mate
-            mate = self.find_mate(atoms)
-            # If mate is found, chase it
+            # If the nearest mate is found, chase it
             if mate:
                 # Chase mate
                 self.chase(mate)
         else:
-            # Wander
-            nearest_atom = self.find_nearest_atom(atoms)
-            # If nearest atom is found, chase it
-            if nearest_atom and nearest_atom.health < self.health:
+            # If nearest atom is found and weaker, chase it
+            if closest_atom and closest_atom.health < self.health:
                 # Chase nearest atom
-                self.chase(nearest_atom)
+                self.chase(closest_atom)
             else:
                 # Wander
-                self.wander()
+                self.wander(noise[2], noise[3])
 
 
 # EVOLVING STRUCTURE
 class EvolvingStructure:
+    # Fixed attribute layout without a per-instance __dict__
+    __slots__ = ("x", "y", "size", "growth_rate", "atoms", "age")
+
     def __init__(self, x, y, size, growth_rate):
         """
         Initializes an instance of the EvolvingStructure class.
@@ -769,35 +736,34 @@ class EvolvingStructure:
             surface (pygame.Surface): The surface to draw on.
 
         Returns:
-            None
+            pygame.Rect: The area of the surface that was drawn on.
         """
-        # For each atom
-        for atom in self.atoms:
-            # Draw atom
-            draw_atom(surface, atom)
         # Draw circle
-        pygame.draw.circle(
+        rect = pygame.draw.circle(
             surface, (0, 255, 0), (int(self.x), int(self.y)), int(self.size), 1
         )
+        # Draw the atoms of the structure
+        rect.unionall_ip([draw_atom(surface, atom) for atom in self.atoms])
+        return rect
 
 
 # FUNCTIONS FOR EVOLVING STRUCTURE
 
 
 # CREATE ATOM
-def create_atom(atom_type: str, atoms: list[Atom]) -> Atom:
+def create_atom(atom_type: int, atoms: list[Atom]) -> Atom:
     """
     Creates an atom based on the given atom_type and initializes its properties accordingly.
 
     Args:
-        atom_type (str): The type of atom to create.
+        atom_type (int): The species of atom to create, one of the *_SPECIES constants.
         atoms (List[Atom]): The list of atoms to which the new atom will be added.
 
     Returns:
         Atom: The newly created atom with the specified properties.
     """
     atom = None
-    if atom_type == "red":
+    if atom_type == RED_SPECIES:
         atom = Atom(
             # Random position for blue atom in the x direction
             random.randint(0, WINDOW_SIZE),
@@ -813,7 +779,7 @@ def create_atom(atom_type: str, atoms: list[Atom]) -> Atom:
             atom_type,
         )
 
-    elif atom_type == "blue":
+    elif atom_type == BLUE_SPECIES:
         atom = Atom(
             # Random position for blue atom in the x direction
             random.randint(0, WINDOW_SIZE),
@@ -831,7 +797,7 @@ def create_atom(atom_type: str, atoms: list[Atom]) -> Atom:
             atom_type,
         )
 
-    elif atom_type == "food":
+    elif atom_type == FOOD_SPECIES:
         atom = Atom(
             # Random position for food in the x direction
             random.randint(0, WINDOW_SIZE),
@@ -849,118 +815,1433 @@ def create_atom(atom_type: str, atoms: list[Atom]) -> Atom:
     return atom  # Return the created atom
 
 
-# APPLY GRAVITY AND FORCES
-# https://en.wikipedia.org/wiki/Net_force
-def apply_gravity_and_forces(atoms: list[Atom]) -> None:
-    """Apply gravity and forces to atoms."""
+# BUILD GRID
+# https://en.wikipedia.org/wiki/Spatial_hashing
+def build_grid(grid: dict[tuple[int, int], list[Atom]], atoms: list[Atom]) -> None:
+    """
+    Inserts the atoms into a uniform spatial hash grid.
+
+    Args:
+        grid (dict): The grid to fill. It is cleared first so the same dict is reused every frame.
+        atoms (list[Atom]): The atoms to insert.
+
+    Returns:
+        None
+
+    Each atom is stored in the cell keyed by (int(x / GRID_CELL_SIZE), int(y / GRID_CELL_SIZE)).
+    """
+    grid.clear()
+    cell_size = GRID_CELL_SIZE
     for atom in atoms:
-        atom.reset_force()  # Reset the force components of the atom
+        key = (int(atom.x / cell_size), int(atom.y / cell_size))
+        cell = grid.get(key)
+        if cell is None:
+            grid[key] = [atom]
+        else:
+            cell.append(atom)
 
-    # For each pair of atoms
-    for i, a in enumerate(atoms):
-        for j, b in enumerate(atoms[i + 1 :], start=i + 1):
-            dx = b.x - a.x  # Distance in the x direction
-            dy = b.y - a.y  # Distance in the y direction
-            distance = math.hypot(dx, dy)  # Distance between the atoms
 
-            # Check if the distance is less than the sum of the radii of the atoms
-            if distance == 0 or distance > FORCE_THRESHOLD:
-                continue
+# NEARBY ATOMS
+# Yield the atoms in the 3x3 grid cells around a position
+def nearby_atoms(grid: dict[tuple[int, int], list[Atom]], x: float, y: float):
+    """
+    Yields the atoms stored in the grid cell of the given position and its 8 neighbours.
+
+    Args:
+        grid (dict): The spatial hash grid of the atoms.
+        x (float): The x-coordinate of the position.
+        y (float): The y-coordinate of the position.
+
+    Yields:
+        Atom: The atoms near the position.
+    """
+    get = grid.get
+    cell_size = GRID_CELL_SIZE
+    cx = int(x / cell_size)
+    cy = int(y / cell_size)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            yield from get((cx + dx, cy + dy), ())
+
+
+# PICK ATOM
+# Find the atom under a position
+def pick_atom(grid: dict[tuple[int, int], list[Atom]], x: float, y: float):
+    """
+    Finds the atom whose circle contains the given position, using the grid instead of
+    scanning all atoms.
+
+    Args:
+        grid (dict): The spatial hash grid of the atoms.
+        x (float): The x-coordinate of the position in world coordinates.
+        y (float): The y-coordinate of the position in world coordinates.
+
+    Returns:
+        Atom or None: The closest atom containing the position, or None if there is none.
+
+    Atoms that have been removed from the world since the grid was built are skipped.
+    """
+    picked = None
+    picked_r2 = float("inf")
+    for atom in nearby_atoms(grid, x, y):
+        dx = x - atom.x
+        dy = y - atom.y
+        r2 = dx * dx + dy * dy
+        if atom.index >= 0 and r2 <= atom.size * atom.size and r2 < picked_r2:
+            picked = atom
+            picked_r2 = r2
+    return picked
+
+
+# WORLD
+# Struct-of-arrays storage of the atoms used by the vectorized physics
+class World:
+    def __init__(self, capacity: int = 256) -> None:
+        """
+        Initializes an empty World.
+
+        The World owns the atoms and keeps their physical state as Struct-of-Arrays
+        NumPy buffers, so the pairwise forces can be computed in a few
+        vectorized passes instead of one Python dispatch per pair.
+        The buffers persist between frames and only grow when they are full,
+        row i of every array belongs to atoms[i]. The physics arrays are float32,
+        which halves the memory traffic and doubles the SIMD lanes of the kernels.
+
+        Args:
+            capacity (int): The initial number of atoms the buffers can hold.
+
+        Initializes the following instance variables:
+            - atoms (list[Atom]): The atoms of the world, atoms[i].index == i.
+            - pos (np.ndarray): (N, 2) array of the x and y coordinates.
+            - vel (np.ndarray): (N, 2) array of the x and y velocities.
+            - mass (np.ndarray): (N,) array of the masses.
+            - charge (np.ndarray): (N,) array of the charges.
+            - species (np.ndarray): (N,) array of the species.
+            - force (np.ndarray): (N, 2) array of the net force acting on each atom.
+            - trail (np.ndarray): (N, TRAIL_LENGTH, 2) ring buffer of the last positions.
+            - trail_count (np.ndarray): (N,) array of the number of positions in each trail.
+            - trail_head (int): The column of the trail ring buffer written next.
+            - neighbor_start (np.ndarray): (N + 1,) offsets of each atom's neighbours.
+            - neighbors (np.ndarray): The indices of the neighbours of every atom.
+            - neighbor_pos (np.ndarray or None): The positions at the last neighbour list build.
+            - node_box, node_child, node_sum, node_atom (np.ndarray): The quadtree node
+              arrays, reused between frames and grown when they run out of nodes.
+        """
+        self.atoms: list[Atom] = []
+        self.neighbor_start = np.zeros(1, dtype=np.int64)
+        self.neighbors = np.empty(0, dtype=np.int64)
+        self.neighbor_pos = None
+        self.trail_head = 0
+        self.resize(capacity)
+        self.resize_quadtree(64)
+
+    # RESIZE
+    # Allocate the atom buffers
+    def resize(self, capacity: int) -> None:
+        """
+        Reallocates the atom buffers for the given number of atoms, keeping their contents.
+
+        Args:
+            capacity (int): The maximum number of atoms.
+
+        Returns:
+            None
+        """
+        n = len(self.atoms)
+        buffers = {
+            "_pos": np.zeros((capacity, 2), dtype=np.float32),
+            "_vel": np.zeros((capacity, 2), dtype=np.float32),
+            "_mass": np.ones(capacity, dtype=np.float32),
+            "_charge": np.zeros(capacity, dtype=np.float32),
+            "_species": np.zeros(capacity, dtype=np.int8),
+            "_force": np.zeros((capacity, 2), dtype=np.float32),
+            "_trail": np.zeros((capacity, int(TRAIL_LENGTH), 2), dtype=np.float32),
+            "_trail_count": np.zeros(capacity, dtype=np.int64),
+        }
+        for name, buffer in buffers.items():
+            if hasattr(self, name):
+                buffer[:n] = getattr(self, name)[:n]
+            setattr(self, name, buffer)
+        self._update_views()
+
+    # UPDATE VIEWS
+    # Point the public arrays at the rows in use
+    def _update_views(self) -> None:
+        """
+        Slices the buffers to the number of atoms, the slices share memory with the buffers.
+
+        Returns:
+            None
+        """
+        n = len(self.atoms)
+        self.pos = self._pos[:n]
+        self.vel = self._vel[:n]
+        self.mass = self._mass[:n]
+        self.charge = self._charge[:n]
+        self.species = self._species[:n]
+        self.force = self._force[:n]
+        self.trail = self._trail[:n]
+        self.trail_count = self._trail_count[:n]
+
+        # The neighbour list holds indices, so it is stale once atoms are added or removed
+        self.neighbor_pos = None
+
+    # ADD ATOM
+    # Append an atom to the world
+    def add_atom(self, atom: Atom) -> None:
+        """
+        Appends an atom and its state to the world, growing the buffers when they are full.
+
+        Args:
+            atom (Atom): The atom to add.
+
+        Returns:
+            None
+        """
+        i = len(self.atoms)
+        if i == len(self._mass):
+            self.resize(2 * i)
+        self._pos[i] = atom.x, atom.y
+        self._vel[i] = atom.vx, atom.vy
+        self._mass[i] = atom.mass
+        self._charge[i] = atom.charge
+        self._species[i] = atom.species
+        self._trail_count[i] = 0
+        atom.index = i
+        self.atoms.append(atom)
+        self._update_views()
+
+    # CLEAR
+    # Remove all atoms
+    def clear(self) -> None:
+        """
+        Removes all atoms from the world, the buffers are kept for reuse.
+
+        Returns:
+            None
+        """
+        for atom in self.atoms:
+            atom.index = -1
+        self.atoms.clear()
+        self._update_views()
+
+    # REMOVE DEAD ATOMS
+    # Remove the atoms that are no longer alive
+    def remove_dead_atoms(self) -> None:
+        """
+        Removes the atoms that are no longer alive from the world.
+
+        The dead atoms are found in one pass over the alive flags. The holes they
+        leave below the new number of atoms are filled with the surviving atoms
+        from above it, moving all their rows with one fancy-indexed copy per buffer,
+        and the tail is dropped. This is O(N) for any number of dead atoms.
+        The order of the remaining atoms is not preserved.
+
+        Returns:
+            None
+        """
+        atoms = self.atoms
+        n = len(atoms)
+        alive = np.fromiter(map(attrgetter("alive"), atoms), np.bool_, n)
+        dead = np.flatnonzero(~alive)
+        if not len(dead):
+            return
+        for i in dead.tolist():
+            atoms[i].index = -1
+
+        # Move the survivors from the tail into the holes
+        count = n - len(dead)
+        holes = dead[dead < count]
+        sources = np.flatnonzero(alive[count:]) + count
+        for buffer in (
+            self._pos,
+            self._vel,
+            self._mass,
+            self._charge,
+            self._species,
+            self._trail,
+            self._trail_count,
+        ):
+            buffer[holes] = buffer[sources]
+        for hole, source in zip(holes.tolist(), sources.tolist()):
+            atom = atoms[source]
+            atom.index = hole
+            atoms[hole] = atom
+        del atoms[count:]
+        self._update_views()
+
+    # RESIZE QUADTREE
+    # Allocate the quadtree node arrays
+    def resize_quadtree(self, capacity: int) -> None:
+        """
+        Allocates the quadtree node arrays for the given number of nodes.
+
+        Args:
+            capacity (int): The maximum number of nodes.
+
+        Returns:
+            None
+        """
+        self.node_box = np.empty((capacity, 3), dtype=np.float64)
+        self.node_child = np.empty((capacity, 4), dtype=np.int64)
+        self.node_sum = np.empty((capacity, 4), dtype=np.float64)
+        self.node_atom = np.empty(capacity, dtype=np.int64)
+
+    # LOAD
+    # Copy the motion of the atoms into the arrays
+    def load(self) -> None:
+        """
+        Loads the positions and velocities of the atoms into the arrays.
+
+        The behavior code moves the atoms one at a time, so their motion is read back
+        before every vectorized pass. Mass, charge and species never change after an
+        atom is added and are only written by add_atom.
+
+        Returns:
+            None
+        """
+        # Read each attribute straight into its column, without temporary tuples
+        atoms = self.atoms
+        n = len(atoms)
+        for column, (p, v) in enumerate((("x", "vx"), ("y", "vy"))):
+            self.pos[:, column] = np.fromiter(map(attrgetter(p), atoms), np.float32, n)
+            self.vel[:, column] = np.fromiter(map(attrgetter(v), atoms), np.float32, n)
+
+    # STORE
+    # Copy the positions and velocities back into the atoms
+    def store(self) -> None:
+        """
+        Writes the positions and velocities held in the arrays back to the atoms.
+
+        Returns:
+            None
+        """
+        atoms = self.atoms
+        for atom, (x, y), (vx, vy) in zip(atoms, self.pos.tolist(), self.vel.tolist()):
+            atom.x = x
+            atom.y = y
+            atom.vx = vx
+            atom.vy = vy
+
+    # WANDER
+    # Random walk of all atoms
+    def wander(self) -> None:
+        """
+        Adds a uniform random value between -WANDER_STRENGTH and WANDER_STRENGTH
+        to the x and y velocities of all atoms.
+
+        The noise is drawn in float32 straight from the generator and scaled in
+        place, so no float64 temporary is created.
+
+        Returns:
+            None
+        """
+        noise = RNG.random(self.vel.shape, dtype=np.float32)
+        noise -= 0.5
+        noise *= 2 * WANDER_STRENGTH
+        self.vel += noise
+
+    # RECORD TRAILS
+    # Add the current positions to the trails
+    def record_trails(self) -> None:
+        """
+        Writes the positions of all atoms into the trail ring buffer.
+
+        All atoms move every frame, so they share one head column and a trail
+        update is a single row copy, the oldest positions are overwritten once
+        the trails are full.
+
+        Returns:
+            None
+        """
+        length = self._trail.shape[1]
+        self.trail[:, self.trail_head] = self.pos
+        self.trail_head = (self.trail_head + 1) % length
+        np.minimum(self.trail_count + 1, length, out=self.trail_count)
+
+    # ACCELERATE
+    # Apply the net forces to the velocities of all atoms
+    def accelerate(self) -> None:
+        """
+        Updates the velocities of all atoms based on the net forces and the drag.
+
+        This is the velocity half of a semi-implicit Euler step, the positions are
+        moved with the new velocities in integrate. The force and the drag force -v
+        are applied in one fused pass as v = (v + F / m) * (1 - 1 / m).
+
+        Returns:
+            None
+        """
+        inv_mass = 1.0 / self.mass[:, None]
+        self.vel += self.force * inv_mass
+        self.vel *= 1.0 - inv_mass
+
+    # INTEGRATE
+    # Move all atoms one step
+    def integrate(self) -> None:
+        """
+        Updates the positions of all atoms based on their velocities.
+
+        This function moves the atoms, applies damping to the velocities, bounces the atoms
+        off the window bounds and limits the velocity, each as one vectorized pass over the arrays.
+
+        Returns:
+            None
+        """
+        # Update the positions based on the velocities
+        self.pos += self.vel
+
+        # Apply damping to velocities
+        self.vel *= DAMPING_FACTOR
+
+        # Bounce the atoms that left the window bounds back into the window
+        outside = (self.pos < 0) | (self.pos > WINDOW_SIZE)
+        self.vel[outside] *= -1
+        np.clip(self.pos, 0, WINDOW_SIZE, out=self.pos)
 
-            # Gravitational force
-            Fg = GRAVITY * a.mass * b.mass / distance**2
-            # Coulomb (electric) force
-            if a.charge == 0 or b.charge == 0:
-                Fe = 0
+        # Limit the velocity
+        np.clip(self.vel, -MAX_VELOCITY, MAX_VELOCITY, out=self.vel)
+
+    # COMPUTE FORCES
+    # https://en.wikipedia.org/wiki/Net_force
+    def compute_forces(self) -> None:
+        """
+        Computes the net gravity and Coulomb force acting on every atom.
+
+        Only the pairs in the neighbour list are evaluated. The list is rebuilt
+        when the atoms changed or any atom moved more than half of NEIGHBOR_SKIN
+        since the last build, so no pair within FORCE_THRESHOLD can be missed.
+        When any FORCE_THRESHOLD-sized cell of the world holds at least
+        BARNES_HUT_MIN_CELL_ATOMS atoms, a Barnes-Hut quadtree approximating the
+        dense cluster is faster instead. The local occupancy is used rather than
+        the average density, so one dense cluster is found however far the other
+        atoms are spread.
+        With a CUDA GPU and at least CUDA_MIN_ATOMS atoms, all pairs are
+        evaluated on the GPU.
+
+        Returns:
+            None
+        """
+        n = len(self.pos)
+        if HAVE_CUDA and n >= CUDA_MIN_ATOMS:
+            compute_forces_cuda(
+                self.pos,
+                self.mass,
+                self.charge,
+                self.force,
+                FORCE_THRESHOLD,
+                GRAVITY,
+                COULOMB,
+                FORCE_SCALE,
+            )
+            return
+
+        if HAVE_NUMBA and n >= BARNES_HUT_MIN_CELL_ATOMS:
+            # Number of atoms in the fullest FORCE_THRESHOLD-sized grid cell
+            cells = (self.pos - self.pos.min(axis=0)) / FORCE_THRESHOLD
+            cells = cells.astype(np.int64)
+            height = cells[:, 1].max() + 1
+            densest = np.bincount(cells[:, 0] * height + cells[:, 1]).max()
+        else:
+            densest = 0
+
+        if densest >= BARNES_HUT_MIN_CELL_ATOMS:
+            # Grow the node arrays until the whole tree fits
+            while (
+                build_quadtree(
+                    self.pos,
+                    self.mass,
+                    self.charge,
+                    self.node_box,
+                    self.node_child,
+                    self.node_sum,
+                    self.node_atom,
+                )
+                < 0
+            ):
+                self.resize_quadtree(max(2 * len(self.node_atom), 4 * n))
+            compute_forces_barnes_hut(
+                self.pos,
+                self.mass,
+                self.charge,
+                self.node_box,
+                self.node_child,
+                self.node_sum,
+                self.node_atom,
+                self.force,
+                FORCE_THRESHOLD,
+                BARNES_HUT_THETA,
+                GRAVITY,
+                COULOMB,
+                FORCE_SCALE,
+            )
+            return
+
+        if self.neighbor_pos is None or (
+            n
+            and ((self.pos - self.neighbor_pos) ** 2).sum(axis=1).max()
+            > (NEIGHBOR_SKIN / 2) ** 2
+        ):
+            self.neighbor_start, self.neighbors = build_neighbor_list(
+                self.pos, FORCE_THRESHOLD + NEIGHBOR_SKIN
+            )
+            self.neighbor_pos = self.pos.copy()
+
+        compute_forces(
+            self.pos,
+            self.mass,
+            self.charge,
+            self.neighbor_start,
+            self.neighbors,
+            self.force,
+            FORCE_THRESHOLD,
+            GRAVITY,
+            COULOMB,
+            FORCE_SCALE,
+        )
+
+
+# SCAN NEIGHBOR CELLS
+# Helper of build_neighbor_list scanning the 3x3 cells around one atom
+@njit(cache=True)
+def _scan_neighbor_cells(
+    i, pos, radius, cells_x, cells_y, cell_start, order, height, neighbors, offset
+):
+    """
+    Finds the atoms with a larger index than atom i within the radius of it,
+    in the 3x3 cells around it.
+
+    The neighbours are written to neighbors[offset:] unless offset is negative.
+    Returns the number of neighbours found.
+    """
+    width = (cell_start.shape[0] - 1) // height
+    xi = pos[i, 0]
+    yi = pos[i, 1]
+    radius2 = radius * radius
+    found = 0
+    for gx in range(max(cells_x[i] - 1, 0), min(cells_x[i] + 2, width)):
+        for gy in range(max(cells_y[i] - 1, 0), min(cells_y[i] + 2, height)):
+            c = gx * height + gy
+            for m in range(cell_start[c], cell_start[c + 1]):
+                j = order[m]
+                dx = pos[j, 0] - xi
+                dy = pos[j, 1] - yi
+                if j > i and dx * dx + dy * dy <= radius2:
+                    if offset >= 0:
+                        neighbors[offset + found] = j
+                    found += 1
+    return found
+
+
+# BUILD NEIGHBOR LIST
+# https://en.wikipedia.org/wiki/Verlet_list
+@njit(
+    "Tuple((int64[::1], int64[::1]))(float32[:, ::1], float64)",
+    parallel=True,
+    cache=True,
+)
+def build_neighbor_list(pos, radius):
+    """
+    Builds the list of atom pairs that are within the given radius of each other.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        radius (float): The neighbour radius, also used as the grid cell size.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The (N + 1,) start offsets and the neighbour indices.
+        The neighbours of atom i are neighbors[start[i]:start[i + 1]]. Every pair is
+        stored once, under the atom with the smaller index (Newton's third law).
+
+    The atoms are sorted into a grid of radius-sized cells, so only the 3x3 cells
+    around each atom have to be scanned.
+    """
+    n = pos.shape[0]
+    start = np.zeros(n + 1, dtype=np.int64)
+    if n == 0:
+        return start, np.empty(0, dtype=np.int64)
+
+    # Grid coordinates of every atom
+    min_x = pos[:, 0].min()
+    min_y = pos[:, 1].min()
+    cells_x = np.empty(n, dtype=np.int64)
+    cells_y = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        cells_x[i] = int((pos[i, 0] - min_x) / radius)
+        cells_y[i] = int((pos[i, 1] - min_y) / radius)
+    width = cells_x.max() + 1
+    height = cells_y.max() + 1
+
+    # Counting sort of the atoms by cell
+    cell_start = np.zeros(width * height + 1, dtype=np.int64)
+    for i in range(n):
+        cell_start[cells_x[i] * height + cells_y[i] + 1] += 1
+    for c in range(width * height):
+        cell_start[c + 1] += cell_start[c]
+    fill = cell_start[:-1].copy()
+    order = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        c = cells_x[i] * height + cells_y[i]
+        order[fill[c]] = i
+        fill[c] += 1
+
+    # Count the neighbours of every atom, then fill them in at their offsets
+    counts = np.zeros(n, dtype=np.int64)
+    neighbors = np.empty(0, dtype=np.int64)
+    for i in prange(n):
+        counts[i] = _scan_neighbor_cells(
+            i, pos, radius, cells_x, cells_y, cell_start, order, height, neighbors, -1
+        )
+    for i in range(n):
+        start[i + 1] = start[i] + counts[i]
+    neighbors = np.empty(start[n], dtype=np.int64)
+    for i in prange(n):
+        _scan_neighbor_cells(
+            i, pos, radius, cells_x, cells_y, cell_start, order, height, neighbors, start[i]
+        )
+
+    return start, neighbors
+
+
+# ACCUMULATE PAIR FORCES
+# Helper of compute_forces applying the pairs of one atom to a force buffer
+@njit(fastmath=True, error_model="numpy", cache=True)
+def _accumulate_pair_forces(
+    i,
+    pos,
+    mass,
+    charge,
+    neighbor_start,
+    neighbors,
+    threshold2,
+    gravity,
+    coulomb,
+    buffer,
+):
+    """
+    Adds the forces of the pairs stored under atom i to both atoms of each pair.
+    """
+    fxi = np.float32(0.0)
+    fyi = np.float32(0.0)
+    xi = pos[i, 0]
+    yi = pos[i, 1]
+    mi = mass[i]
+    qi = charge[i]
+    for k in range(neighbor_start[i], neighbor_start[i + 1]):
+        j = neighbors[k]
+        dx = pos[j, 0] - xi
+        dy = pos[j, 1] - yi
+        # Clamped so atoms on top of each other do not overflow, their d is 0 anyway
+        r2 = max(dx * dx + dy * dy, np.float32(MIN_R2))
+        # Pairs outside the force threshold get a zero weight instead of a branch,
+        # the scatter into buffer[j] still keeps the loop scalar
+        inv_r = np.float32(r2 <= threshold2) / math.sqrt(r2)
+        inv_r3 = inv_r * inv_r * inv_r
+        # Gravity attracts, like charges repel: (Fg - Fe) * d / distance
+        c = (gravity * mi * mass[j] - coulomb * qi * charge[j]) * inv_r3
+        fxi += c * dx
+        fyi += c * dy
+        # The partner feels the opposite force
+        buffer[j, 0] -= c * dx
+        buffer[j, 1] -= c * dy
+    buffer[i, 0] += fxi
+    buffer[i, 1] += fyi
+
+
+# COMPUTE FORCES
+# Compiled pairwise force kernel, compiled at import time for the given signature
+@njit(
+    "void(float32[:, ::1], float32[::1], float32[::1], int64[::1], int64[::1], float32[:, ::1], float32, float32, float32, float32)",
+    parallel=True,
+    fastmath=True,
+    cache=True,
+)
+def compute_forces(
+    pos,
+    mass,
+    charge,
+    neighbor_start,
+    neighbors,
+    force,
+    threshold,
+    gravity,
+    coulomb,
+    force_scale,
+):
+    """
+    Computes the net gravity and Coulomb force acting on every atom.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        mass (np.ndarray): (N,) array of the masses.
+        charge (np.ndarray): (N,) array of the charges.
+        neighbor_start (np.ndarray): (N + 1,) offsets of each atom's neighbours.
+        neighbors (np.ndarray): The neighbour indices from build_neighbor_list.
+        force (np.ndarray): (N, 2) output array for the net forces.
+        threshold (float): The distance beyond which atoms do not interact.
+        gravity (float): The gravitational constant.
+        coulomb (float): The Coulomb constant.
+        force_scale (float): The scale factor applied to the net forces.
+
+    Returns:
+        None
+
+    Every pair is evaluated once and applied to both atoms with opposite signs
+    (Newton's third law). Each thread accumulates into its own force buffer,
+    which are summed at the end, so no writes conflict. Pairs that are further
+    apart than the threshold, or that sit on top of each other, do not interact.
+    The constants are arguments rather than globals, which numba would freeze
+    into the compiled and cached kernel.
+    """
+    n = pos.shape[0]
+    threshold2 = threshold * threshold
+    chunks = max(min(NUM_THREADS, n), 1)
+    buffers = np.zeros((chunks, n, 2), dtype=np.float32)
+    for chunk in prange(chunks):
+        buffer = buffers[chunk]
+        for i in range(chunk, n, chunks):
+            _accumulate_pair_forces(
+                i,
+                pos,
+                mass,
+                charge,
+                neighbor_start,
+                neighbors,
+                threshold2,
+                gravity,
+                coulomb,
+                buffer,
+            )
+
+    # Sum the buffers of all threads and scale the forces
+    for i in prange(n):
+        fxi = np.float32(0.0)
+        fyi = np.float32(0.0)
+        for chunk in range(chunks):
+            fxi += buffers[chunk, i, 0]
+            fyi += buffers[chunk, i, 1]
+        force[i, 0] = fxi * force_scale
+        force[i, 1] = fyi * force_scale
+
+
+# BUILD QUADTREE
+# https://en.wikipedia.org/wiki/Barnes%E2%80%93Hut_simulation
+@njit(cache=True)
+def build_quadtree(pos, mass, charge, node_box, node_child, node_sum, node_atom):
+    """
+    Inserts all atoms into a quadtree stored in preallocated node arrays.
+
+    Node 0 is the root covering all atoms. Each node records its square box,
+    its four children (-1 for a leaf), the total mass, the mass weighted
+    position and the total charge of its atoms, and the atom of a leaf.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        mass (np.ndarray): (N,) array of the masses.
+        charge (np.ndarray): (N,) array of the charges.
+        node_box (np.ndarray): (M, 3) output array of the x, y and size of each node.
+        node_child (np.ndarray): (M, 4) output array of the children of each node.
+        node_sum (np.ndarray): (M, 4) output array of the mass, mass * x, mass * y and charge.
+        node_atom (np.ndarray): (M,) output array of the atom in each leaf, -1 if empty.
+
+    Returns:
+        int: The number of nodes used, or -1 if the node arrays are too small.
+    """
+    n = pos.shape[0]
+    capacity = node_box.shape[0]
+    x_min = pos[:, 0].min()
+    y_min = pos[:, 1].min()
+    size = max(pos[:, 0].max() - x_min, pos[:, 1].max() - y_min) + 1e-6
+    node_box[0, 0] = x_min
+    node_box[0, 1] = y_min
+    node_box[0, 2] = size
+    node_child[0, :] = -1
+    node_sum[0, :] = 0.0
+    node_atom[0] = -1
+    count = 1
+
+    for i in range(n):
+        x = pos[i, 0]
+        y = pos[i, 1]
+        node = 0
+        depth = 0
+        while True:
+            # Every node on the path contains atom i
+            node_sum[node, 0] += mass[i]
+            node_sum[node, 1] += mass[i] * x
+            node_sum[node, 2] += mass[i] * y
+            node_sum[node, 3] += charge[i]
+            half = node_box[node, 2] * 0.5
+
+            if node_child[node, 0] == -1:
+                # An empty leaf takes the atom
+                if node_atom[node] == -1:
+                    node_atom[node] = i
+                    break
+                # Too deep, the atoms are practically on top of each other
+                if depth >= QUADTREE_MAX_DEPTH:
+                    break
+                if count + 4 > capacity:
+                    return -1
+
+                # Split the leaf and move its atom into the matching child
+                for q in range(4):
+                    child = count + q
+                    node_box[child, 0] = node_box[node, 0] + half * (q & 1)
+                    node_box[child, 1] = node_box[node, 1] + half * (q >> 1)
+                    node_box[child, 2] = half
+                    node_child[child, :] = -1
+                    node_sum[child, :] = 0.0
+                    node_atom[child] = -1
+                    node_child[node, q] = child
+                count += 4
+                j = node_atom[node]
+                node_atom[node] = -1
+                q = int(pos[j, 0] >= node_box[node, 0] + half) + 2 * int(
+                    pos[j, 1] >= node_box[node, 1] + half
+                )
+                child = node_child[node, q]
+                node_atom[child] = j
+                node_sum[child, 0] = mass[j]
+                node_sum[child, 1] = mass[j] * pos[j, 0]
+                node_sum[child, 2] = mass[j] * pos[j, 1]
+                node_sum[child, 3] = charge[j]
+
+            # Descend into the child containing atom i
+            q = int(x >= node_box[node, 0] + half) + 2 * int(
+                y >= node_box[node, 1] + half
+            )
+            node = node_child[node, q]
+            depth += 1
+
+    return count
+
+
+# ACCUMULATE TREE FORCES
+# Helper of compute_forces_barnes_hut walking the quadtree for one atom
+@njit(fastmath=True, cache=True)
+def _accumulate_tree_forces(
+    i,
+    pos,
+    mass,
+    charge,
+    node_box,
+    node_child,
+    node_sum,
+    node_atom,
+    stack,
+    threshold2,
+    theta2,
+    gravity,
+    coulomb,
+    force,
+):
+    """
+    Sums the forces of the quadtree nodes acting on atom i.
+
+    Nodes that are entirely further away than the threshold are skipped.
+    A node whose size / distance is below theta acts as a single
+    pseudo-atom at its center of mass with its total mass and charge.
+    """
+    xi = pos[i, 0]
+    yi = pos[i, 1]
+    mi = mass[i]
+    qi = charge[i]
+    fxi = 0.0
+    fyi = 0.0
+    stack[0] = 0
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        m = node_sum[node, 0]
+        if m == 0.0 or node_atom[node] == i:
+            continue
+
+        # Skip nodes whose box lies outside the force threshold
+        size = node_box[node, 2]
+        bx = max(node_box[node, 0] - xi, 0.0, xi - node_box[node, 0] - size)
+        by = max(node_box[node, 1] - yi, 0.0, yi - node_box[node, 1] - size)
+        if bx * bx + by * by > threshold2:
+            continue
+
+        dx = node_sum[node, 1] / m - xi
+        dy = node_sum[node, 2] / m - yi
+        r2 = dx * dx + dy * dy
+        if node_child[node, 0] == -1 or (
+            size * size < theta2 * r2 and r2 <= threshold2
+        ):
+            # Clamped so atoms on top of each other do not overflow, leaves outside
+            # the force threshold get a zero weight instead of a branch. A zero
+            # charge makes the Coulomb term zero without a test of its own
+            r2 = max(r2, MIN_R2)
+            inv_r = (r2 <= threshold2) / math.sqrt(r2)
+            inv_r3 = inv_r * inv_r * inv_r
+            # Gravity attracts, like charges repel: (Fg - Fe) * d / distance
+            c = (gravity * mi * m - coulomb * qi * node_sum[node, 3]) * inv_r3
+            fxi += c * dx
+            fyi += c * dy
+        else:
+            for q in range(4):
+                stack[top] = node_child[node, q]
+                top += 1
+
+    force[i, 0] = fxi
+    force[i, 1] = fyi
+
+
+# COMPUTE FORCES (BARNES-HUT)
+# https://en.wikipedia.org/wiki/Barnes%E2%80%93Hut_simulation
+@njit(
+    "void(float32[:, ::1], float32[::1], float32[::1], float64[:, ::1], int64[:, ::1], float64[:, ::1], int64[::1], float32[:, ::1], float64, float64, float64, float64, float64)",
+    parallel=True,
+    fastmath=True,
+    cache=True,
+)
+def compute_forces_barnes_hut(
+    pos,
+    mass,
+    charge,
+    node_box,
+    node_child,
+    node_sum,
+    node_atom,
+    force,
+    threshold,
+    theta,
+    gravity,
+    coulomb,
+    force_scale,
+):
+    """
+    Approximates the net gravity and Coulomb force acting on every atom.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        mass (np.ndarray): (N,) array of the masses.
+        charge (np.ndarray): (N,) array of the charges.
+        node_box (np.ndarray): The node boxes from build_quadtree.
+        node_child (np.ndarray): The node children from build_quadtree.
+        node_sum (np.ndarray): The node sums from build_quadtree.
+        node_atom (np.ndarray): The leaf atoms from build_quadtree.
+        force (np.ndarray): (N, 2) output array for the net forces.
+        threshold (float): The distance beyond which atoms do not interact.
+        theta (float): The opening criterion of the nodes.
+        gravity (float): The gravitational constant.
+        coulomb (float): The Coulomb constant.
+        force_scale (float): The scale factor applied to the net forces.
+
+    Returns:
+        None
+
+    Every thread walks the tree for its own atoms, so only O(N log N) nodes
+    are visited instead of every pair in dense clusters. The node sums of many
+    atoms are kept in float64.
+    """
+    n = pos.shape[0]
+    threshold2 = threshold * threshold
+    theta2 = theta * theta
+    # Fold the scale into the constants once instead of scaling every force
+    gravity *= force_scale
+    coulomb *= force_scale
+    chunks = max(min(NUM_THREADS, n), 1)
+    for chunk in prange(chunks):
+        # Every level pushes at most four children
+        stack = np.empty(4 * QUADTREE_MAX_DEPTH + 8, dtype=np.int64)
+        for i in range(chunk, n, chunks):
+            _accumulate_tree_forces(
+                i,
+                pos,
+                mass,
+                charge,
+                node_box,
+                node_child,
+                node_sum,
+                node_atom,
+                stack,
+                threshold2,
+                theta2,
+                gravity,
+                coulomb,
+                force,
+            )
+
+
+# BUILD NEIGHBOR LIST (NUMPY)
+# NumPy version of build_neighbor_list, used when numba is not installed
+def build_neighbor_list_numpy(pos, radius):
+    """
+    Builds the list of atom pairs that are within the given radius of each other.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        radius (float): The neighbour radius.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The (N + 1,) start offsets and the neighbour indices,
+        in the same layout as build_neighbor_list.
+    """
+    n = len(pos)
+    # The x and y distances are separate contiguous (N, N) planes, which is much
+    # faster than summing over the last axis of an (N, N, 2) array. Comparing the
+    # whole matrix and masking is also faster than gathering np.triu_indices pairs
+    x = pos[:, 0]
+    y = pos[:, 1]
+    r2 = x[None, :] - x[:, None]
+    dy = y[None, :] - y[:, None]
+    r2 *= r2
+    dy *= dy
+    r2 += dy
+
+    # Keep every pair once, above the diagonal. np.nonzero returns the pairs
+    # in row-major order, so they are grouped by atom
+    i, j = np.nonzero(np.triu(r2 <= radius * radius, k=1))
+    start = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(i, minlength=n), out=start[1:])
+    return start, j.astype(np.int64)
+
+
+# COMPUTE FORCES (NUMPY)
+# NumPy version of compute_forces, used when numba is not installed
+def compute_forces_numpy(
+    pos,
+    mass,
+    charge,
+    neighbor_start,
+    neighbors,
+    force,
+    threshold,
+    gravity,
+    coulomb,
+    force_scale,
+):
+    """
+    Computes the net gravity and Coulomb force acting on every atom.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+        mass (np.ndarray): (N,) array of the masses.
+        charge (np.ndarray): (N,) array of the charges.
+        neighbor_start (np.ndarray): (N + 1,) offsets of each atom's neighbours.
+        neighbors (np.ndarray): The neighbour indices from build_neighbor_list.
+        force (np.ndarray): (N, 2) output array for the net forces.
+        threshold (float): The distance beyond which atoms do not interact.
+        gravity (float): The gravitational constant.
+        coulomb (float): The Coulomb constant.
+        force_scale (float): The scale factor applied to the net forces.
+
+    Returns:
+        None
+    """
+    n = len(pos)
+    i = np.repeat(np.arange(n), np.diff(neighbor_start))
+    j = neighbors
+    d = pos[j] - pos[i]
+    r2 = (d * d).sum(axis=1)
+
+    # Only pairs within the force threshold interact. 1 / (r2 * sqrt(r2)) is
+    # computed in place for all pairs, with r2 clamped so atoms on top of each
+    # other do not overflow, and the division by the mask zeroes the others
+    within = r2 <= threshold * threshold
+    np.maximum(r2, MIN_R2, out=r2)
+    inv_r3 = np.sqrt(r2)
+    inv_r3 *= r2
+    np.divide(within, inv_r3, out=inv_r3)
+
+    # Gravity attracts, like charges repel: (Fg - Fe) * d / distance
+    c = (gravity * mass[i] * mass[j] - coulomb * charge[i] * charge[j]) * inv_r3
+
+    # Apply every pair to both atoms with opposite signs (Newton's third law)
+    for axis in range(2):
+        f = c * d[:, axis]
+        force[:, axis] = (
+            np.bincount(i, f, minlength=n) - np.bincount(j, f, minlength=n)
+        ) * force_scale
+
+
+# GPU version of compute_forces, only defined when a CUDA GPU is available
+if HAVE_CUDA:
+
+    # COMPUTE FORCES (CUDA KERNEL)
+    # https://developer.nvidia.com/gpugems/gpugems3/part-v-physics-simulation/chapter-31-fast-n-body-simulation-cuda
+    @cuda.jit(fastmath=True)
+    def _compute_forces_cuda_kernel(
+        pos, mass, charge, force, threshold2, gravity, coulomb
+    ):
+        """
+        Sums the forces of all atoms acting on the atom of each thread.
+
+        The atoms are processed in tiles of CUDA_TILE, each thread of a block loads
+        one atom of the tile into shared memory, so every atom is read from global
+        memory once per block instead of once per thread. Padding beyond the last
+        atom has zero mass and charge and the atom itself has d = 0, so neither
+        adds a force.
+        """
+        tile_pos = cuda.shared.array((CUDA_TILE, 2), dtype=np.float32)
+        tile_mass = cuda.shared.array(CUDA_TILE, dtype=np.float32)
+        tile_charge = cuda.shared.array(CUDA_TILE, dtype=np.float32)
+        n = pos.shape[0]
+        i = cuda.grid(1)
+        t = cuda.threadIdx.x
+        k = min(i, n - 1)
+        xi = pos[k, 0]
+        yi = pos[k, 1]
+        mi = mass[k]
+        qi = charge[k]
+        fxi = np.float32(0.0)
+        fyi = np.float32(0.0)
+        for start in range(0, n, CUDA_TILE):
+            j = start + t
+            if j < n:
+                tile_pos[t, 0] = pos[j, 0]
+                tile_pos[t, 1] = pos[j, 1]
+                tile_mass[t] = mass[j]
+                tile_charge[t] = charge[j]
             else:
-                Fe = COULOMB * a.charge * b.charge / distance**2
+                tile_pos[t, 0] = xi
+                tile_pos[t, 1] = yi
+                tile_mass[t] = 0.0
+                tile_charge[t] = 0.0
+            cuda.syncthreads()
+            for m in range(CUDA_TILE):
+                dx = tile_pos[m, 0] - xi
+                dy = tile_pos[m, 1] - yi
+                r2 = max(dx * dx + dy * dy, np.float32(MIN_R2))
+                inv_r = np.float32(r2 <= threshold2) / math.sqrt(r2)
+                inv_r3 = inv_r * inv_r * inv_r
+                # Gravity attracts, like charges repel: (Fg - Fe) * d / distance
+                c = (
+                    gravity * mi * tile_mass[m] - coulomb * qi * tile_charge[m]
+                ) * inv_r3
+                fxi += c * dx
+                fyi += c * dy
+            cuda.syncthreads()
+        if i < n:
+            force[i, 0] = fxi
+            force[i, 1] = fyi
+
+    # COMPUTE FORCES (CUDA)
+    # Copy the arrays to the GPU, run the kernel and copy the forces back
+    def compute_forces_cuda(
+        pos, mass, charge, force, threshold, gravity, coulomb, force_scale
+    ):
+        """
+        Computes the net gravity and Coulomb force acting on every atom on the GPU.
 
-            # Net force components
-            Fx = (Fg - Fe) * dx / distance
-            Fy = (Fg - Fe) * dy / distance
+        Args:
+            pos (np.ndarray): (N, 2) array of the x and y coordinates.
+            mass (np.ndarray): (N,) array of the masses.
+            charge (np.ndarray): (N,) array of the charges.
+            force (np.ndarray): (N, 2) output array for the net forces.
+            threshold (float): The distance beyond which atoms do not interact.
+            gravity (float): The gravitational constant.
+            coulomb (float): The Coulomb constant.
+            force_scale (float): The scale factor applied to the net forces.
 
-            # Scale the forces
-            Fx *= FORCE_SCALE
-            Fy *= FORCE_SCALE
+        Returns:
+            None
 
-            # Apply the force to the atoms
-            a.apply_force(Fx, Fy)
-            b.apply_force(-Fx, -Fy)
+        Every thread evaluates all pairs of its own atom, which is twice the
+        pairs of the CPU kernels but needs no neighbour list and no atomic writes.
+        The behavior code moves the atoms on the CPU, so the arrays are copied
+        to the GPU every frame.
+        """
+        n = len(pos)
+        if n == 0:
+            return
+        device_force = cuda.device_array_like(force)
+        blocks = (n + CUDA_TILE - 1) // CUDA_TILE
+        _compute_forces_cuda_kernel[blocks, CUDA_TILE](
+            cuda.to_device(pos),
+            cuda.to_device(mass),
+            cuda.to_device(charge),
+            device_force,
+            np.float32(threshold * threshold),
+            # Fold the scale into the constants once instead of scaling every force
+            np.float32(gravity * force_scale),
+            np.float32(coulomb * force_scale),
+        )
+        device_force.copy_to_host(force)
 
-    # Apply forces to atoms
-    for atom in atoms:
-        atom.apply_force(-atom.vx, -atom.vy)
 
-    # Wandering and Reproducing
-    for atom in atoms:
-        atom.wander()
-        atom.check_bounds()
-        atom.eat(atoms)
-        atom.reproduce(atoms)
-        atom.find_nearest_food(atoms)
-        # Checking collisions with other atoms
-        for other in atoms:
-            if other != atom and atom.check_collision(other):
-                atom.resolve_collision(other)
-        atom.flee(atoms)
-        atom.update_position()
+# Use the NumPy kernels when numba is not installed
+if not HAVE_NUMBA:
+    build_neighbor_list = build_neighbor_list_numpy
+    compute_forces = compute_forces_numpy
+
+
+# APPLY GRAVITY AND FORCES
+# https://en.wikipedia.org/wiki/Net_force
+def apply_gravity_and_forces(
+    world: World, grid: dict[tuple[int, int], list[Atom]]
+) -> None:
+    """Apply gravity and forces to the atoms of the world."""
+    # Compute the net pairwise forces in one vectorized pass
+    world.load()
+    world.compute_forces()
+
+    # Update the velocities based on the forces and the drag
+    world.accelerate()
+
+    # Wandering: one batch of uniform noise for all atoms
+    world.wander()
+    world.store()
+
+    # Eating and reproducing. Collisions are handled once by handle_collisions
+    # and fleeing is part of decide_behavior. Offspring is appended to
+    # world.atoms, the loop runs over a copy so it is not visited until the next frame
+    atoms = world.atoms
+    for atom in atoms.copy():
+        # Atoms eaten earlier in this loop take no turn
+        if not atom.alive:
+            continue
+        atom.eat(grid)
+        atom.reproduce(world, grid)
+
+    # Remove the eaten food atoms
+    world.remove_dead_atoms()
+
+    # Update the positions of the atoms
+    update_positions(world)
+
+
+# UPDATE POSITIONS
+# Update the positions of all atoms
+def update_positions(world: World) -> None:
+    """
+    Update the positions of all atoms of the world and their trails.
+
+    Args:
+        world (World): The world whose atoms are moved in one vectorized update.
+
+    Returns:
+        None
+    """
+    world.load()
+    world.integrate()
+    world.store()
+
+    # Update trails in the ring buffer of the world
+    world.record_trails()
+
+
+# Forward neighbour cells, every pair of adjacent cells is visited from one side only
+HALF_NEIGHBOR_CELLS = ((1, 0), (1, 1), (0, 1), (-1, 1))
 
 
 # Handle Collisions
-def handle_collisions(atoms):
+def handle_collisions(grid):
     """
     Handle collisions between atoms in the simulation.
 
     Parameters:
-        atoms (list): A list of Atom objects representing the atoms in the simulation.
+        grid (dict): The spatial hash grid of the atoms.
+
+    Returns:
+        None
+
+    Only atoms in the same or in adjacent grid cells are tested, each pair once:
+    the pairs within a cell, and the pairs with the 4 cells in HALF_NEIGHBOR_CELLS.
+    The grid may be from earlier in the frame. The atoms moved far less than a cell
+    since then, so no colliding pair is missed, and removed atoms are skipped.
+    """
+    get = grid.get
+    for (cx, cy), cell in grid.items():
+        # Pairs within the cell
+        n = len(cell)
+        for i in range(n):
+            atom = cell[i]
+            if not atom.alive:
+                continue
+            for j in range(i + 1, n):
+                other = cell[j]
+                # If atoms collide
+                if other.alive and atom.check_collision(other):
+                    atom.resolve_collision(other)
+
+        # Pairs with the forward neighbour cells
+        for dx, dy in HALF_NEIGHBOR_CELLS:
+            neighbor = get((cx + dx, cy + dy))
+            if neighbor is None:
+                continue
+            for atom in cell:
+                if not atom.alive:
+                    continue
+                for other in neighbor:
+                    # If atoms collide
+                    if other.alive and atom.check_collision(other):
+                        atom.resolve_collision(other)
+
+
+# Pre-rendered atom sprites, keyed by (color, radius). Cleared by zoom_at, since
+# the radii of a zoom level are not reused at the next one
+_sprite_cache: dict[tuple[tuple[int, int, int], int], pygame.Surface] = {}
+
+
+# GET ATOM SPRITE
+# Render a filled circle once and reuse it
+def get_atom_sprite(color: tuple[int, int, int], radius: int) -> pygame.Surface:
+    """
+    Returns a transparent sprite with a filled circle of the given color and radius.
+
+    The atom colors are quantized to INTENSITY_BUCKETS levels, so only a few sprites
+    exist per radius and nearly every lookup is a cache hit.
+
+    Args:
+        color (tuple[int, int, int]): The color of the circle.
+        radius (int): The radius of the circle in pixels.
+
+    Returns:
+        pygame.Surface: The cached (2 * radius + 1, 2 * radius + 1) sprite.
+    """
+    key = (color, radius)
+    sprite = _sprite_cache.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+        gfxdraw.filled_circle(sprite, radius, radius, radius, color)
+        _sprite_cache[key] = sprite
+    return sprite
+
+
+# GET ATOM COLOR
+# Look up the color of one atom
+def get_atom_color(atom) -> tuple[int, int, int]:
+    """
+    Returns the palette color of an atom for its charge and energy.
+
+    Args:
+        atom (Atom): The atom to color.
 
     Returns:
+        tuple[int, int, int]: The color from ATOM_PALETTE.
     """
-    # Check for collisions between atoms
-    # For each atom
-    for i in range(len(atoms)):
-        # For each other atom
-        for j in range(i + 1, len(atoms)):
-            # If atoms collide
-            if atoms[i].check_collision(atoms[j]):
-                atoms[i].resolve_collision(atoms[j])
+    bucket = min(INTENSITY_BUCKETS - 1, int(atom.energy * 10) * INTENSITY_BUCKETS // 256)
+    return ATOM_PALETTE[bucket + INTENSITY_BUCKETS * (atom.charge > 0)]
+
+
+# ATOM COLORS
+# Look up the colors of all atoms at once
+def atom_colors(world: World) -> list[tuple[int, int, int]]:
+    """
+    Returns the palette colors of all atoms, with the energy buckets computed in one
+    vectorized pass over the World arrays.
+
+    Args:
+        world (World): The world holding the atoms.
+
+    Returns:
+        list[tuple[int, int, int]]: The color from ATOM_PALETTE of every atom.
+    """
+    # The kinetic energy, as in Atom.energy
+    energy = 0.5 * world.mass * (world.vel * world.vel).sum(axis=1)
+    buckets = np.minimum(
+        INTENSITY_BUCKETS - 1, (energy * 10).astype(np.int64) * INTENSITY_BUCKETS // 256
+    )
+    buckets += INTENSITY_BUCKETS * (world.charge > 0)
+    palette = ATOM_PALETTE
+    return [palette[bucket] for bucket in buckets.tolist()]
+
+
+# SCREEN POSITIONS
+# Transform world positions to screen positions
+def screen_positions(pos: np.ndarray) -> list[list[int]]:
+    """
+    Transforms world positions to integer screen positions in one vectorized pass.
+
+    Args:
+        pos (np.ndarray): (N, 2) array of the x and y coordinates.
+
+    Returns:
+        list[list[int]]: The [x, y] screen position of every row.
+    """
+    return ((pos - (PAN_X, PAN_Y)) * ZOOM_LEVEL).astype(np.int64).tolist()
+
+
+# SCREEN TRAILS
+# Transform the trails of all atoms to screen positions
+def screen_trails(world: World) -> list[np.ndarray]:
+    """
+    Transforms the trails of all atoms to integer screen positions in one vectorized pass.
+
+    Args:
+        world (World): The world holding the trail ring buffer.
+
+    Returns:
+        list[np.ndarray]: The (T, 2) screen positions of the trail of every atom,
+        oldest first. pygame.draw.lines takes the array rows directly, which is much
+        cheaper than converting every point to a Python list.
+    """
+    length = world.trail.shape[1]
+    # Unroll the ring buffer so the oldest position comes first
+    order = (np.arange(length) + world.trail_head) % length
+    trails = ((world.trail[:, order] - (PAN_X, PAN_Y)) * ZOOM_LEVEL).astype(np.int64)
+    # Trails that are not full yet only hold their newest positions
+    return [
+        trail[length - count :]
+        for trail, count in zip(trails, world.trail_count.tolist())
+    ]
+
+
+# TRAIL THICKNESS
+# The same for all atoms in a frame
+def get_trail_thickness() -> int:
+    """
+    Returns the thickness of the trails for the current zoom level.
+
+    Returns:
+        int: The trail thickness in pixels.
+    """
+    # Exponential adjustment, limit to prevent overflow
+    return max(1, int(math.exp(min(ZOOM_LEVEL - 1, 3))))
 
 
 # Draw Atom with thickness based on zoom level
-def draw_atom(surface, atom):
+def draw_atom(
+    surface, atom, screen_pos=None, trail=None, trail_thickness=None, color=None
+):
     """
     Draw an atom on the given surface with trails and a health bar.
 
     Args:
         surface: The surface to draw on.
         atom: The atom object to be drawn.
+        screen_pos (list[int], optional): The screen position of the atom from
+            screen_positions. Computed from the atom when not given.
+        trail (np.ndarray, optional): The screen positions of the trail of the atom
+            from screen_trails. No trail is drawn when not given.
+        trail_thickness (int, optional): The trail thickness from get_trail_thickness.
+            Computed when not given.
+        color (tuple[int, int, int], optional): The color of the atom from atom_colors.
+            Looked up from the atom when not given.
 
     Returns:
-        None
+        pygame.Rect: The area of the surface that was drawn on.
     """
-    # Calculate color intensity based on energy
-    intensity = min(255, int(atom.energy * 10))  # Adjust the scaling factor as needed
-    color = (
-        (intensity, intensity, 255) if atom.charge > 0 else (255, intensity, intensity)
-    )
+    # The color intensity is based on energy, quantized so the sprites are shared
+    if color is None:
+        color = get_atom_color(atom)
     # Draw atom with thickness based on zoom level
-    pos_x = int((atom.x - PAN_X) * ZOOM_LEVEL)
-    pos_y = int((atom.y - PAN_Y) * ZOOM_LEVEL)
-    pygame.draw.circle(surface, color, (pos_x, pos_y), int(atom.size * ZOOM_LEVEL))
-    # Draw trails with thickness based on zoom level
-    trail_thickness = max(
-        1, int(math.exp(min(ZOOM_LEVEL - 1, 3)))
-    )  # Exponential adjustment, limit to prevent overflow
-    for i in range(len(atom.trail) - 1):
-        # Calculate trail coordinates
-        trail_x1 = int((atom.trail[i][0] - PAN_X) * ZOOM_LEVEL)
-        trail_y1 = int((atom.trail[i][1] - PAN_Y) * ZOOM_LEVEL)
-        trail_x2 = int((atom.trail[i + 1][0] - PAN_X) * ZOOM_LEVEL)
-        trail_y2 = int((atom.trail[i + 1][1] - PAN_Y) * ZOOM_LEVEL)
-        # Draw a line with trail thickness
-        pygame.draw.line(
-            surface, color, (trail_x1, trail_y1), (trail_x2, trail_y2), trail_thickness
+    if screen_pos is None:
+        pos_x = int((atom.x - PAN_X) * ZOOM_LEVEL)
+        pos_y = int((atom.y - PAN_Y) * ZOOM_LEVEL)
+    else:
+        pos_x, pos_y = screen_pos
+    radius = int(atom.size * ZOOM_LEVEL)
+    if 0 < radius <= SPRITE_MAX_RADIUS:
+        rect = surface.blit(
+            get_atom_sprite(color, radius), (pos_x - radius, pos_y - radius)
         )
+    elif radius > SPRITE_MAX_RADIUS:
+        # Sprites of zoomed in atoms would be large and rarely reused
+        rect = pygame.draw.circle(surface, color, (pos_x, pos_y), radius)
+    else:
+        rect = pygame.Rect(pos_x, pos_y, 0, 0)
+    # Draw trails with thickness based on zoom level
+    if trail is not None and len(trail) > 1:
+        if trail_thickness is None:
+            trail_thickness = get_trail_thickness()
+        # Draw the whole polyline in one call
+        rect.union_ip(pygame.draw.lines(surface, color, False, trail, trail_thickness))
     # Draw health bar
     health_bar_length = int(ATOM_SIZE * 2 * ZOOM_LEVEL)
     # Draw health bar height
@@ -968,15 +2249,14 @@ def draw_atom(surface, atom):
     # Adjust the health bar position to keep it centered
     health_bar_x = pos_x - health_bar_length // 2
     health_bar_y = pos_y - int(atom.size * ZOOM_LEVEL) - health_bar_height - 2
-    # Draw health bar
-    pygame.draw.rect(
-        surface,
-        (255, 0, 0),
-        (health_bar_x, health_bar_y, health_bar_length, health_bar_height),
+    # Draw health bar with plain fills, the green part lies within the red background
+    rect.union_ip(
+        surface.fill(
+            RED, (health_bar_x, health_bar_y, health_bar_length, health_bar_height)
+        )
     )
-    pygame.draw.rect(
-        surface,
-        (0, 255, 0),
+    surface.fill(
+        GREEN,
         (
             health_bar_x,
             health_bar_y,
@@ -984,38 +2264,117 @@ def draw_atom(surface, atom):
             health_bar_height,
         ),
     )
+    return rect
 
 
 # Save Simulation
-def save_simulation(atoms, filename="simulation.pkl"):
+def save_simulation(world, filename="simulation.npz"):
     """
-    Save the simulation data to a file.
+    Save the simulation data to a file in SAVE_DIR.
+
+    The atoms are stored as one NumPy array per attribute in a compressed .npz
+    file, so the format does not depend on the layout of the Atom class.
 
     Args:
-        atoms (list): A list of atoms representing the simulation state.
-        filename (str, optional): The name of the file to save the simulation data. Defaults to "simulation.pkl".
+        world (World): The world holding the atoms of the simulation state.
+        filename (str, optional): The name of the file to save the simulation data.
+            Defaults to "simulation.npz".
 
     Returns:
         None
     """
-    with open(filename, "wb") as file:
-        pickle.dump(atoms, file)
+    path = get_save_path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The behavior code changes the velocities after the last vectorized pass
+    world.load()
+    atoms = world.atoms
+    n = len(atoms)
+    # The attributes that are not held in the World arrays
+    state = {
+        name: np.fromiter(map(attrgetter(name), atoms), dtype, n)
+        for name, dtype in (
+            ("size", np.float64),
+            ("hunger", np.float64),
+            ("health", np.float64),
+            ("age", np.int64),
+            ("in_battle", np.bool_),
+            ("reproduction_cooldown", np.float64),
+        )
+    }
+    np.savez_compressed(
+        path,
+        pos=world.pos,
+        vel=world.vel,
+        mass=world.mass,
+        charge=world.charge,
+        species=world.species,
+        color=np.array([atom.color for atom in atoms], dtype=np.int64).reshape(n, 3),
+        **state,
+    )
 
 
 # Load Simulation
-def load_simulation(filename="simulation.pkl"):
+def load_simulation(filename="simulation.npz"):
     """
-    Load the simulation data from a file.
+    Load the simulation data from a file in SAVE_DIR.
 
     Args:
         filename (str, optional): The name of the file to load the simulation data from.
-            Defaults to "simulation.pkl".
+            Defaults to "simulation.npz".
+
+    Returns:
+        list[Atom]: The atoms loaded from the file.
+    """
+    # np.load refuses pickled objects, only plain arrays are read
+    with np.load(get_save_path(filename)) as data:
+        columns = zip(
+            data["pos"].tolist(),
+            data["vel"].tolist(),
+            data["mass"].tolist(),
+            data["charge"].tolist(),
+            data["size"].tolist(),
+            data["color"].tolist(),
+            data["species"].tolist(),
+            data["hunger"].tolist(),
+            data["health"].tolist(),
+            data["age"].tolist(),
+            data["in_battle"].tolist(),
+            data["reproduction_cooldown"].tolist(),
+        )
+    atoms = []
+    for (x, y), (vx, vy), mass, charge, size, color, species, *state in columns:
+        atom = Atom(x, y, vx, vy, mass, charge, size, tuple(color), species)
+        (
+            atom.hunger,
+            atom.health,
+            atom.age,
+            atom.in_battle,
+            atom.reproduction_cooldown,
+        ) = state
+        atoms.append(atom)
+    return atoms
+
+
+# Get Save Path
+def get_save_path(filename):
+    """
+    Resolves the path of a save file and checks that it lies within SAVE_DIR.
+
+    Args:
+        filename (str): The name of the save file, relative to SAVE_DIR.
 
     Returns:
-        list: The simulation data loaded from the file.
+        Path: The resolved path of the save file.
+
+    Raises:
+        ValueError: If the path leads outside of SAVE_DIR, e.g. through ".." or
+            an absolute path.
     """
-    with open(filename, "rb") as file:
-        return pickle.load(file)
+    save_dir = SAVE_DIR.resolve()
+    path = (save_dir / filename).resolve()
+    if not path.is_relative_to(save_dir):
+        raise ValueError(f"The save file {filename} is outside of {SAVE_DIR}")
+    return path
 
 
 # Zoom At mouse position
@@ -1033,6 +2392,8 @@ def zoom_at(mouse_pos, zoom_factor):
     global ZOOM_LEVEL, PAN_X, PAN_Y
     old_zoom_level = ZOOM_LEVEL
     ZOOM_LEVEL *= zoom_factor
+    # The atom radii change with the zoom level, drop the sprites of the old one
+    _sprite_cache.clear()
     # Convert mouse position to world coordinates
     mouse_x, mouse_y = mouse_pos
     # Calculate new and old world coordinates
@@ -1075,31 +2436,38 @@ def combine_atoms(atom1, atom2):
 
 
 # Update Atoms and Structures
-def update_atoms(atoms, structures):
+def update_atoms(world, structures, grid):
     """
     Update the positions and attributes of atoms in the simulation.
 
     Parameters:
-        atoms (list): A list of Atom objects representing the atoms in the simulation.
+        world (World): The world holding the atoms in the simulation.
         structures (list): A list of Structure objects representing the structures in the simulation.
+        grid (dict): The spatial hash grid of the atoms.
 
     Returns:
         None
     """
+    # Draw the random noise for the behavior of all atoms in one batch
+    atoms = world.atoms
+    noise = RNG.uniform(-1.0, 1.0, (len(atoms), 4)).tolist()
+
     # Update atom positions
-    for atom in atoms:
+    for atom, atom_noise in zip(atoms, noise):
         # Update age
         atom.age += 1
-        # Update hunger and energy
+        # Update hunger
         atom.hunger -= 0.1
-        atom.energy -= 0.2
-        # Check if the atom is dead
-        if atom.hunger <= 0 or atom.energy <= 0:
+        # Check if the atom is dead, 0.2 energy is burnt every frame
+        if atom.hunger <= 0 or atom.energy <= 0.2:
             atom.health -= 0.5
         if atom.health <= 0:
-            atoms.remove(atom)
+            atom.alive = False
         # AI decision-making
-        atom.decide_behavior(atoms)
+        atom.decide_behavior(grid, atom_noise)
+
+    # Remove the atoms that died of hunger in one compaction
+    world.remove_dead_atoms()
 
 
 # Update Structures
@@ -1119,6 +2487,33 @@ def update_structures(structures):
         structure.grow()
 
 
+# Simulation Step
+def simulation_step(world, structures, grid):
+    """
+    Advances the simulation by one physics step.
+
+    Args:
+        world (World): The world holding the atoms in the simulation.
+        structures (list): A list of Structure objects representing the structures in the simulation.
+        grid (dict): The spatial hash grid of the atoms, rebuilt for the step.
+
+    Returns:
+        None
+    """
+    # Insert the atoms into the spatial hash grid
+    build_grid(grid, world.atoms)
+
+    # Apply gravity and forces to atoms
+    apply_gravity_and_forces(world, grid)
+
+    # Handle collisions with other atoms
+    handle_collisions(grid)
+
+    # Update atoms and structures
+    update_atoms(world, structures, grid)
+    update_structures(structures)
+
+
 # Constants for the number of structures
 NUM_STRUCTURES = 5  # Define the number of structures
 
@@ -1131,15 +2526,21 @@ window = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
 # Set window caption
 pygame.display.set_caption("Life Simulation by L4ndbo (version: 6_21062024)")
 
-# Create atoms
-atoms = []
-for _ in range(NUM_ATOMS):
-    species = random.choice(["red", "blue"])
-    atoms.append(create_atom(species, atoms))
+# Create the world holding the vectorized physics state
+world = World()
+
+# Create the spatial hash grid, rebuilt once per frame
+grid: dict[tuple[int, int], list[Atom]] = {}
+
+# Create atoms, the world owns the list so it is never rebound.
+# The species of all atoms are drawn in one batch
+atoms = world.atoms
+for species in RNG.integers(RED_SPECIES, BLUE_SPECIES + 1, NUM_ATOMS).tolist():
+    world.add_atom(create_atom(species, atoms))
 
 # Create food atoms
 for _ in range(NUM_FOOD_ATOMS):
-    atoms.append(create_atom("food", atoms))
+    world.add_atom(create_atom(FOOD_SPECIES, atoms))
 
 # Create structures
 structures = []
@@ -1156,7 +2557,7 @@ for _ in range(NUM_STRUCTURES):
         )
     )
 
-# Set simulation speed
+# The clock paces the frames, the simulation speed is the number of steps per frame
 clock = pygame.time.Clock()
 
 # Set pan speed
@@ -1169,23 +2570,39 @@ selected_atom = None
 # Start time of the simulation
 start_time = pygame.time.get_ticks()
 
+# Areas drawn in the last frame, only these are erased and updated on screen
+dirty_rects: list[pygame.Rect] = []
+full_redraw = True  # Redraw the whole window in the next frame
+
+# Time of the last window caption update
+caption_time = 0
+caption_atom = None  # The selected atom the caption was last refreshed for
+
+# Physics steps due, a fractional SIMULATION_SPEED carries over to the next frames
+pending_steps = 0.0
+
 # running simulation
 running = True
 while running:
     # Poll for events
     # Url: https://www.pygame.org/docs/ref/event.html
 
-    # Set simulation speed
-    clock.tick(SIMULATION_SPEED)
-
-    # Fill window with black
-    window.fill((0, 0, 0))  # Fill window with black
+    # Erase what was drawn in the last frame
+    if full_redraw:
+        window.fill(BLACK)  # Fill window with black
+    else:
+        for rect in dirty_rects:
+            window.fill(BLACK, rect)
     for event in pygame.event.get():
         # Check for quit event
         # pygame.QUIT event means the user clicked X to close your window
         if event.type == pygame.QUIT:
             running = False
 
+        # The window was uncovered and has to be drawn again completely
+        elif event.type == pygame.VIDEOEXPOSE:
+            full_redraw = True
+
         # Check for keyboard events (KEYDOWN for key pressed, KEYUP for key released)
         elif event.type == pygame.KEYDOWN:
             # Check for key presses
@@ -1196,17 +2613,18 @@ while running:
 
             # R for RESET SIMULATION
             elif event.key == pygame.K_r:  # Reset
-                atoms = []
+                world.clear()
                 structures = []
+                selected_atom = None
 
-                # Create atoms
-                for _ in range(NUM_ATOMS):
-                    species = random.choice(["red", "blue"])
-                    atoms.append(create_atom(species, atoms))
+                # Create atoms, drawing their species in one batch
+                species = RNG.integers(RED_SPECIES, BLUE_SPECIES + 1, NUM_ATOMS)
+                for atom_type in species.tolist():
+                    world.add_atom(create_atom(atom_type, atoms))
 
                 # Create food atoms
                 for _ in range(NUM_FOOD_ATOMS):
-                    atoms.append(create_atom("food", atoms))
+                    world.add_atom(create_atom(FOOD_SPECIES, atoms))
 
                 # Create additional structures
                 for _ in range(NUM_STRUCTURES):
@@ -1232,15 +2650,20 @@ while running:
             # SIMULATION STATE CONTROLS
             # L for LOAD SIMULATION
             elif event.key == pygame.K_l:  # Load simulation
-                atoms = load_simulation()
+                loaded_atoms = load_simulation()
+                world.clear()
+                selected_atom = None
+                for atom in loaded_atoms:
+                    world.add_atom(atom)
             # S for SAVE SIMULATION
             elif event.key == pygame.K_s:  # Save simulation
-                save_simulation(atoms)
+                save_simulation(world)
 
             # N for NEW SIMULATION
             elif event.key == pygame.K_n:  # New simulation
-                atoms = []
+                world.clear()
                 structures = []
+                selected_atom = None
                 start_time = pygame.time.get_ticks()
 
             # Q for QUIT
@@ -1254,13 +2677,13 @@ while running:
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if event.button == 1:  # Left click
                 mx, my = event.pos
-                for atom in atoms:
-                    pos_x = int((atom.x - PAN_X) * ZOOM_LEVEL)  # Convert to integer
-                    pos_y = int((atom.y - PAN_Y) * ZOOM_LEVEL)  # Convert to integer
-                    # Check if the mouse is within the radius of the atom
-                    if math.hypot(mx - pos_x, my - pos_y) <= atom.size * ZOOM_LEVEL:
-                        selected_atom = atom
-                        break
+                # The grid is only built in simulation steps, rebuild it so atoms
+                # added by a reset or load and atoms moved since are found
+                build_grid(grid, world.atoms)
+                # Convert the mouse position to world coordinates and look it up in the grid
+                atom = pick_atom(grid, mx / ZOOM_LEVEL + PAN_X, my / ZOOM_LEVEL + PAN_Y)
+                if atom is not None:
+                    selected_atom = atom
             elif event.button == 3:  # Right click
                 panning = True
                 (
@@ -1284,62 +2707,80 @@ while running:
                 PAN_X -= dx / ZOOM_LEVEL
                 PAN_Y -= dy / ZOOM_LEVEL
 
-    # Apply gravity and forces to atoms
-    apply_gravity_and_forces(atoms)
-
-    # Handle collisions with other atoms
-    handle_collisions(atoms)
-
-    # Update atoms and structures
-    update_atoms(atoms, structures)
-    update_structures(structures)
-
-    # Draw atoms
-    for atom in atoms:
-        atom.decide_behavior(atoms)  # AI decision making
-        atom.update_position()  # Draw atoms using the draw_atom function
-        draw_atom(window, atom)  # Draw atoms with thickness based on zoom level
-
-    # Draw food
-    for atom in atoms:
-        if atom.species == "food":
-            draw_atom(window, atom)
+    # Run the physics steps due this frame, none while paused
+    pending_steps += SIMULATION_SPEED
+    while pending_steps >= 1:
+        pending_steps -= 1
+        simulation_step(world, structures, grid)
+
+    # Deselect the atom once it has been removed from the world
+    if selected_atom is not None and selected_atom.index < 0:
+        selected_atom = None
+
+    # Draw atoms and food in one pass, the behavior and positions were already
+    # updated by apply_gravity_and_forces and update_atoms
+    drawn_rects = []
+    # Transform all positions and trails to the screen and look up all colors at
+    # once, the trail thickness is shared
+    screen = screen_positions(world.pos)
+    trails = screen_trails(world)
+    colors = atom_colors(world)
+    trail_thickness = get_trail_thickness()
+    for atom, screen_pos, trail, color in zip(atoms, screen, trails, colors):
+        # Draw atoms with thickness based on zoom level
+        drawn_rects.append(
+            draw_atom(window, atom, screen_pos, trail, trail_thickness, color)
+        )
 
     # Draw structures with thickness based on zoom level
     for structure in structures:
-        structure.grow()  # Increase structure size
-        structure.draw(window)  # Draw structure with thickness based on zoom level
+        # Draw structure with thickness based on zoom level
+        drawn_rects.append(structure.draw(window))
 
-    # Calculate total simulation time
+    # Formatting and setting the caption is slow, refresh it only every
+    # CAPTION_INTERVAL milliseconds and not at all while paused, unless another
+    # atom has been selected or deselected
     current_time = pygame.time.get_ticks()
-    total_time = (current_time - start_time) / 1000  # Convert to seconds
-
-    # If an atom is selected, update the window caption
-    if selected_atom:
-        pygame.display.set_caption(
-            f"Life Simulation by L4ndbo (version: 6_21062024) || Selected Atom: {selected_atom.species} | Age: {selected_atom.age} | Health: {selected_atom.health} | Hunger: {selected_atom.hunger} | Energy: {selected_atom.energy}"
-        )
+    if selected_atom is not caption_atom or (
+        SIMULATION_SPEED != 0 and current_time - caption_time >= CAPTION_INTERVAL
+    ):
+        caption_time = current_time
+        caption_atom = selected_atom
+        # Calculate total simulation time
+        total_time = (current_time - start_time) / 1000  # Convert to seconds
+
+        # If an atom is selected, update the window caption
+        if selected_atom:
+            pygame.display.set_caption(
+                f"Life Simulation by L4ndbo (version: 6_21062024) || Selected Atom: {SPECIES_NAMES[selected_atom.species]} | Age: {selected_atom.age} | Health: {selected_atom.health} | Hunger: {selected_atom.hunger} | Energy: {selected_atom.energy}"
+            )
+        else:
+            # Count the atoms of every species in one pass over the species array
+            species_counts = np.bincount(world.species, minlength=len(SPECIES_NAMES))
+            red_count = species_counts[RED_SPECIES]
+            blue_count = species_counts[BLUE_SPECIES]
+            # Calculate the total, average and oldest age of the atoms
+            ages = np.fromiter(map(attrgetter("age"), atoms), np.int64, len(atoms))
+            total_age = ages.sum()
+            average_age = total_age / len(atoms) if atoms else 0
+            oldest_age = ages.max() if atoms else 0
+            # Calculate the number of structures
+            structure_count = len(structures)
+
+            # Update window caption
+            pygame.display.set_caption(
+                f"Life Simulation by L4ndbo (version: 6_21062024) || Toal Simulation Time: {total_time:.2f} | Total Red: {red_count} | Total Blue: {blue_count} | Avg Atom Age: {average_age:.2f} | Oldest Atom: {oldest_age} | Total Structures: {structure_count}"
+            )
+
+    # Update the changed areas of the screen, the erased and the newly drawn ones
+    if full_redraw:
+        pygame.display.flip()
+        full_redraw = False
     else:
-        # Calculate the number of red atoms
-        red_count = sum(1 for atom in atoms if atom.species == "red")
-        # Calculate the number of blue atoms
-        blue_count = sum(1 for atom in atoms if atom.species == "blue")
-        # Calculate the total age of the atoms
-        total_age = sum(atom.age for atom in atoms)
-        # Calculate the average age of the atoms
-        average_age = total_age / len(atoms) if atoms else 0
-        # Calculate the oldest age of the atoms
-        oldest_age = max(atom.age for atom in atoms) if atoms else 0
-        # Calculate the number of structures
-        structure_count = len(structures)
-
-        # Update window caption
-        pygame.display.set_caption(
-            f"Life Simulation by L4ndbo (version: 6_21062024) || Toal Simulation Time: {total_time:.2f} | Total Red: {red_count} | Total Blue: {blue_count} | Avg Atom Age: {average_age:.2f} | Oldest Atom: {oldest_age} | Total Structures: {structure_count}"
-        )
+        pygame.display.update(dirty_rects + drawn_rects)
+    dirty_rects = drawn_rects
 
-    # Update simulation speed
-    pygame.display.flip()
+    # Pace the frames, the only wait of the loop
     clock.tick(60)  # Limit to 60 frames per second
 
 # Quit Pygame